@@ -0,0 +1,163 @@
+"""
+ローカルの代替サーバを相手に、ダウンロード (get_episodes) と投稿 (episode_auto_input) の性能を測る。
+実際のサイトには一切アクセスしない。
+
+    cd public/app
+    python -m bench.run --sizes 10,100,500 --latency 0.02
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from bench.server import KAKUYOMU_WORK_ID_BASE, StandInServer, make_text
+from lib.http_uploader import HttpUploader
+from lib.kakuyomu import KakuyomuData
+from lib.kakuyomu_driver import KakuyomuDriver
+from lib.narou import NarouData
+from lib.narou_driver import NarouDriver
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def measure(func, memory: bool) -> dict:
+    """func() を実行して所要時間と、memory が True なら Python のヒープのピーク使用量を測る"""
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    episodes = func()
+    elapsed = time.perf_counter() - started
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    size = sum(len(episode.get('content', '').encode('utf-8')) for episode in episodes)
+    return {
+        "episodes": len(episodes),
+        "seconds": round(elapsed, 3),
+        "episodes_per_sec": round(len(episodes) / elapsed, 2) if elapsed else None,
+        "bytes_per_sec": round(size / elapsed) if elapsed else None,
+        "peak_memory_mb": round(peak / 1024 / 1024, 2) if peak is not None else None,
+    }
+
+
+def narou_source(base_url: str, args) -> NarouData:
+    narou = NarouData(max_workers=args.workers, requests_per_second=args.rps, parser=args.parser)
+    narou.url = base_url + '/{}/{}'
+    narou.api_url = base_url + '/novelapi/api/'
+    return narou
+
+
+def kakuyomu_source(base_url: str, args) -> KakuyomuData:
+    kakuyomu = KakuyomuData(max_workers=args.workers, requests_per_second=args.rps, parser=args.parser)
+    kakuyomu.url = base_url
+    return kakuyomu
+
+
+def bench_narou_download(base_url: str, size: int, args):
+    narou = narou_source(base_url, args)
+    return narou.get_episodes(narou.get_work_info(f"nb{size}"))
+
+
+def bench_kakuyomu_download(base_url: str, size: int, args):
+    kakuyomu = kakuyomu_source(base_url, args)
+    return kakuyomu.get_episodes(kakuyomu.get_work_info(f"{base_url}/works/{KAKUYOMU_WORK_ID_BASE + size}"))
+
+
+def synthetic_episodes(size: int, chars: int) -> list:
+    return [{"title": f"第{n}話", "content": make_text(n, chars)} for n in range(1, size + 1)]
+
+
+def bench_http_upload(base_url: str, size: int, args):
+    episodes = synthetic_episodes(size, args.chars)
+    uploader = HttpUploader(requests.Session(), NarouDriver.title_field, NarouDriver.body_field,
+                            NarouDriver.submit_selectors, requests_per_second=args.rps)
+    for episode in episodes:
+        uploader.post_episode(f"{base_url}/draftepisode/input/ncode/1/", episode)
+    return episodes
+
+
+def bench_browser_upload(base_url: str, size: int, args):
+    # 実際の Chrome で代替サーバの投稿フォームに入力する (ログインは行わない)
+    class BenchDriver(KakuyomuDriver):
+        domain = '127.0.0.1'
+
+        def login(self):
+            return
+
+    episodes = synthetic_episodes(size, args.chars)
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as f:
+        json.dump({
+            "upload": {"max_retries": 0, "pipeline": args.pipeline},
+            "browser": {"headless": args.headless, "block_resources": args.block_resources},
+        }, f)
+    driver = BenchDriver(f.name)
+    try:
+        driver.episode_auto_input(f"{base_url}/my/works/1", episodes)
+    finally:
+        driver.close()
+        os.remove(f.name)
+    return episodes
+
+
+CASES = {
+    "narou_get_episodes": bench_narou_download,
+    "kakuyomu_get_episodes": bench_kakuyomu_download,
+    "http_upload": bench_http_upload,
+    "browser_episode_auto_input": bench_browser_upload,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ローカルの代替サーバを使ったベンチマーク")
+    parser.add_argument("--sizes", default="10,100", help="作品の話数 (カンマ区切り)")
+    parser.add_argument("--chars", type=int, default=5000, help="1話あたりの本文の文字数")
+    parser.add_argument("--latency", type=float, default=0.0, help="サーバの応答遅延 (秒)")
+    parser.add_argument("--workers", type=int, default=4, help="同時ダウンロード数")
+    parser.add_argument("--rps", type=float, default=0, help="1秒あたりの最大リクエスト数 (0 で無制限)")
+    parser.add_argument("--parser", default=None, help="HTML の解析エンジン")
+    parser.add_argument("--cases", default="narou_get_episodes,kakuyomu_get_episodes,http_upload",
+                        help=f"実行するケース ({', '.join(CASES)})")
+    parser.add_argument("--pipeline", action="store_true", help="ブラウザでの投稿で2つのタブによる先読みを使う")
+    parser.add_argument("--headless", action="store_true", help="ブラウザでの投稿を画面を表示せずに行う")
+    parser.add_argument("--block-resources", action="store_true", help="ブラウザでの投稿で画像などを読み込まない")
+    parser.add_argument("--no-memory", action="store_true", help="メモリ使用量を測らない")
+    parser.add_argument("--output", help="結果を JSON で保存するファイル")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    server = StandInServer(latency=args.latency, chars=args.chars).start()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    results = []
+    try:
+        for case in args.cases.split(','):
+            for size in sizes:
+                # 時間の計測と、tracemalloc を有効にしたメモリの計測は別々に行う
+                result = measure(lambda: CASES[case](server.base_url, size, args), memory=False)
+                if not args.no_memory:
+                    result["peak_memory_mb"] = measure(lambda: CASES[case](server.base_url, size, args), memory=True)["peak_memory_mb"]
+                results.append({"case": case, "size": size, **result})
+                print(f"{case:28s} {size:6d}話  {result['seconds']:8.2f}s  "
+                      f"{result['episodes_per_sec'] or 0:8.2f} 話/s  {(result['bytes_per_sec'] or 0) / 1024:10.1f} KiB/s  "
+                      f"peak {result['peak_memory_mb'] if result['peak_memory_mb'] is not None else '-'} MB")
+    finally:
+        server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"args": vars(args), "results": results, "metrics": metrics.snapshot()}, f, ensure_ascii=False, indent=2)
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+import gzip
+import json
+import re
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 作品IDに話数を埋め込む (例: なろう "nb120" / カクヨム "9000120" → 120話)
+NAROU_NCODE = re.compile(r'^nb(\d+)$')
+KAKUYOMU_WORK_ID_BASE = 9000000
+
+
+def make_text(number: int, chars: int) -> str:
+    line = f"　第{number}話の本文です。ベンチマーク用のダミーテキストが続きます。"
+    lines = []
+    size = 0
+    while size < chars:
+        lines.append(line)
+        size += len(line)
+    return "\n".join(lines)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """小説家になろう / カクヨムの代わりに合成ページを返すハンドラ"""
+
+    server_version = "StandIn/1.0"
+
+    def log_message(self, format, *args):
+        return
+
+    def _send(self, status: int, body: str | bytes, content_type: str = 'text/html; charset=utf-8', headers: dict | None = None):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        time.sleep(self.server.latency)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.count(len(data))
+        return
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+
+        # なろう: 小説API
+        if parts[:2] == ['novelapi', 'api']:
+            query = parse_qs(url.query)
+            body = json.dumps(self.narou_api(query.get('ncode', [''])[0].split('-')), ensure_ascii=False)
+            if query.get('gzip'):
+                return self._send(200, gzip.compress(body.encode('utf-8')), 'application/octet-stream')
+            return self._send(200, body, 'application/json')
+
+        # なろう: エピソードページ /{ncode}/{number}
+        if len(parts) == 2 and NAROU_NCODE.match(parts[0]):
+            total = int(NAROU_NCODE.match(parts[0]).group(1))
+            number = int(parts[1])
+            if not 1 <= number <= total:
+                return self._send(404, 'not found')
+            return self._send(200, self.narou_episode(number))
+
+        # カクヨム: 作品ページ /works/{id} とエピソードページ /works/{id}/episodes/{episode_id}
+        if parts[:1] == ['works'] and len(parts) == 2:
+            return self._send(200, self.kakuyomu_work(parts[1]))
+        if parts[:1] == ['works'] and len(parts) == 4 and parts[2] == 'episodes':
+            return self._send(200, self.kakuyomu_episode(int(parts[3]) % 100000))
+
+        # 投稿フォーム (なろう: /draftepisode/input/..., カクヨム: /my/works/{id}/episodes/new)
+        if parts[:1] == ['draftepisode']:
+            return self._send(200, self.editor_form('subtitle', 'novel', 'usernoveldatainputForm'))
+        if parts[:2] == ['my', 'works'] and parts[-1] == 'new':
+            return self._send(200, self.editor_form('title', 'body', 'episodeForm', button_id='updateButton'))
+        if parts[:1] == ['done']:
+            return self._send(200, '<html><body><p>投稿しました</p></body></html>')
+
+        return self._send(404, 'not found')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = parse_qs(self.rfile.read(length).decode('utf-8'))
+        if body.get('token') != ['bench-token']:
+            return self._send(403, 'invalid token')
+
+        self.server.posted += 1
+        return self._send(303, '', headers={'Location': '/done'})
+
+    def narou_api(self, ncodes: list) -> list:
+        works = []
+        for ncode in ncodes:
+            match = NAROU_NCODE.match(ncode.lower())
+            if match is None:
+                continue
+            works.append({
+                "ncode": ncode.upper(),
+                "title": f"ベンチマーク作品 {ncode}",
+                "general_all_no": int(match.group(1)),
+                "novelupdated_at": "2025-01-01 00:00:00",
+            })
+        return [{"allcount": len(works)}, *works]
+
+    def narou_episode(self, number: int) -> str:
+        paragraphs = "".join(f'<p id="L{i}">{escape(line)}</p>' for i, line in enumerate(make_text(number, self.server.chars).split("\n"), 1))
+        return (
+            '<!DOCTYPE html><html><head><title>bench</title></head><body><article class="p-novel">'
+            f'<h1 class="p-novel__title p-novel__title--rensai">第{number}話</h1>'
+            f'<div class="js-novel-text p-novel__text">{paragraphs}</div>'
+            '</article></body></html>'
+        )
+
+    def kakuyomu_work(self, work_id: str) -> str:
+        total = int(work_id) - KAKUYOMU_WORK_ID_BASE
+        state = {
+            f"Work:{work_id}": {
+                "title": f"ベンチマーク作品 {work_id}",
+                "author": {"__ref": "UserAccount:1"},
+                "tableOfContents": [{"__ref": "TableOfContentsChapter:1"}],
+            },
+            "UserAccount:1": {"activityName": "bench", "name": "bench"},
+            "TableOfContentsChapter:1": {
+                "episodeUnions": [{"__ref": f"Episode:{n}"} for n in range(1, total + 1)],
+            },
+        }
+        for n in range(1, total + 1):
+            state[f"Episode:{n}"] = {"__typename": "Episode", "id": str(100000 + n), "title": f"第{n}話"}
+        next_data = {"props": {"pageProps": {"__APOLLO_STATE__": state}}}
+        return (
+            '<!DOCTYPE html><html><head><title>bench</title></head><body>'
+            f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(next_data, ensure_ascii=False)}</script>'
+            '</body></html>'
+        )
+
+    def kakuyomu_episode(self, number: int) -> str:
+        paragraphs = "".join(f'<p id="p{i}">{escape(line)}</p>' for i, line in enumerate(make_text(number, self.server.chars).split("\n"), 1))
+        return (
+            '<!DOCTYPE html><html><head><title>bench</title></head><body>'
+            f'<p class="widget-episodeTitle js-vertical-composition-item">第{number}話</p>'
+            f'<div class="widget-episodeBody js-episode-body">{paragraphs}</div>'
+            '</body></html>'
+        )
+
+    @staticmethod
+    def editor_form(title_field: str, body_field: str, form_id: str, button_id: str | None = None) -> str:
+        button = f'<button type="submit" id="{button_id}">投稿</button>' if button_id else ''
+        return (
+            '<!DOCTYPE html><html><head><title>editor</title></head><body>'
+            f'<form id="{form_id}" method="post" action="/submit">'
+            '<input type="hidden" name="token" value="bench-token">'
+            f'<input type="text" name="{title_field}"><textarea name="{body_field}"></textarea>{button}'
+            '</form>'
+            f'<button type="submit" form="{form_id}">投稿</button>'
+            '</body></html>'
+        )
+
+
+class StandInServer(ThreadingHTTPServer):
+    """ベンチマーク用のローカルサーバ。latency 秒の応答遅延と、chars 文字の本文を返す"""
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.0, chars: int = 5000):
+        super().__init__(('127.0.0.1', port), StandInHandler)
+        self.latency = latency
+        self.chars = chars
+        self.posted = 0
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, size: int):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += size
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
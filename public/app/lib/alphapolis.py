@@ -1,17 +1,56 @@
-import time
-import json
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-
-class AlphaplisData:
-    def __init__(self):
-        self.url = 'https://ncode.syosetu.com/{}/{}'
-        self.api_url = 'https://api.syosetu.com/novelapi/api/'
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0"
-        })
-
-        return
\ No newline at end of file
+import re
+import logging
+from lib.source import BaseSource
+
+logger = logging.getLogger(__name__)
+
+WORK_URL = re.compile(r'/novel/(\d+)/(\d+)')
+
+
+class AlphapolisData(BaseSource):
+    url = 'https://www.alphapolis.co.jp'
+    episode_selectors = {
+        "title": ".episode-title",
+        # 古いページは本文の id が novelBoby になっている
+        "content": "#novelBody, #novelBoby",
+    }
+
+    def get_work_info(self, link: str) -> dict | None:
+        match = WORK_URL.search(link)
+        if match is None:
+            logger.error(f"❌ 作品URLの形式が正しくありません: {link}")
+            return None
+
+        author_id, work_id = match.groups()
+        response = self.limiter.get(self.session, self.get_absolute_url(f"/novel/{author_id}/{work_id}"))
+        if not response.ok:
+            return None
+
+        # 目次は作品ページに全話分が載っているので、1回の取得でエピソードの一覧が揃う
+        html = self.parser.soup(response.text)
+        episode_link = re.compile(rf'/novel/{author_id}/{work_id}/episode/(\d+)')
+        episode_urls = []
+        for anchor in html.select('a[href*="/episode/"]'):
+            found = episode_link.search(anchor['href'])
+            if found:
+                episode_urls.append(self.get_absolute_url(f"/novel/{author_id}/{work_id}/episode/{found.group(1)}"))
+        # 目次と「最新話」などのリンクで同じエピソードが重複するので、最初に現れた順で1つにする
+        episode_urls = list(dict.fromkeys(episode_urls))
+        if not episode_urls:
+            logger.error("❌ 作品ページの目次からエピソードを読み取れませんでした")
+            return None
+
+        title = html.select_one('h1.title') or html.select_one('h1')
+        author = html.select_one('.author a')
+
+        return {
+            'id': work_id,
+            'title': title.get_text(strip=True) if title else None,
+            'author_name': author.get_text(strip=True) if author else None,
+            'author_url': self.get_absolute_url(author['href']) if author and author.get('href') else None,
+            'episode_urls': episode_urls,
+            'first_url': episode_urls[0],
+        }
+
+    def iter_episodes(self, work: dict):
+        return self.iter_episode_urls(work['episode_urls'])
@@ -0,0 +1,221 @@
+import json
+import logging
+import time
+from lib.platforms import PLATFORMS, LazySources, can_upload, get_driver_class
+from lib.pool import DriverPool
+from utils.archive import WorkArchive
+from utils.cache import EpisodeCache
+from utils.fetcher import HostRateLimiter
+from utils.manifest import SyncManifest
+from utils.pipeline import EpisodeStream
+from utils import profiling
+
+logger = logging.getLogger(__name__)
+
+
+def open_work(source: str, ref: str, sources: dict) -> dict | None:
+    """
+    掲載元の作品情報を取得し、ダウンロード用の情報をまとめて返す。
+    episodes はまだダウンロードを始めていないイテレータ関数で、呼び出した時点で取得を開始する。
+    source が "archive" の場合は ref をアーカイブのパスとして読む (通信しない)。
+    """
+    if source == "archive":
+        archive = WorkArchive(ref)
+
+        def episodes():
+            try:
+                yield from archive.iter_episodes()
+            finally:
+                archive.close()
+
+        return {
+            "title": archive.title,
+            # 元の作品と同じ ID を使い、掲載元から直接投稿した場合と同じマニフェストで差分を取る
+            "source_id": archive.source_id,
+            "total": len(archive),
+            "episodes": episodes,
+        }
+
+    if source == "kakuyomu":
+        kakuyomu = sources["kakuyomu"]
+        with profiling.unit('metadata', ref):
+            work = kakuyomu.get_work_info(ref)
+        if work is None:
+            return None
+
+        return {
+            "title": work['title'],
+            "source_id": f"kakuyomu:{work['id']}",
+            "total": len(work['episode_urls']),
+            "episodes": lambda: kakuyomu.iter_episodes(work),
+        }
+
+    if source == "narou":
+        narou = sources["narou"]
+        with profiling.unit('metadata', ref):
+            work = narou.get_work_info(ref)
+        if work is None:
+            return None
+
+        return {
+            "title": work['title'],
+            "source_id": f"narou:{work['ncode'].lower()}",
+            "total": int(work['general_all_no']),
+            "episodes": lambda: narou.iter_episodes(work),
+        }
+
+    if source == "alphapolis":
+        alphapolis = sources["alphapolis"]
+        with profiling.unit('metadata', ref):
+            work = alphapolis.get_work_info(ref)
+        if work is None:
+            return None
+
+        return {
+            "title": work['title'],
+            "source_id": f"alphapolis:{work['id']}",
+            "total": len(work['episode_urls']),
+            "episodes": lambda: alphapolis.iter_episodes(work),
+        }
+
+    raise ValueError(f"未対応のプラットフォームです: {source}")
+
+
+def load_jobs(path: str) -> list:
+    """
+    ジョブファイルを読み込む。形式:
+    {"jobs": [{"source": "narou", "work": "n5922lb", "destination": "kakuyomu",
+               "management_url": "https://kakuyomu.jp/my/works/..."}]}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    jobs = data['jobs'] if isinstance(data, dict) else data
+    for idx, job in enumerate(jobs, 1):
+        missing = [key for key in ("source", "work", "destination", "management_url") if not job.get(key)]
+        if missing:
+            raise ValueError(f"ジョブ {idx} に必須項目がありません: {', '.join(missing)}")
+        if job["source"] == job["destination"]:
+            raise ValueError(f"ジョブ {idx}: 同じプラットフォームを選択することはできません")
+        if not can_upload(job["destination"]):
+            raise ValueError(f"ジョブ {idx}: 投稿先に使えないプラットフォームです: {job['destination']}")
+    return jobs
+
+
+class BatchRunner:
+    """
+    ジョブファイルの作品をまとめて処理する。
+    サイトごとに同時実行数 (concurrency) と1秒あたりのリクエスト数 (requests_per_second) の上限を持ち、
+    ダウンロード元としても投稿先としても同じ上限を使う。
+    """
+
+    default_site_conf = {"concurrency": 2, "requests_per_second": 1.0}
+
+    def __init__(self, conf: dict, conf_path: str):
+        self.conf = conf
+        self.conf_path = conf_path
+        self.site_conf = {
+            site: {**self.default_site_conf, **conf.get("batch", {}).get("sites", {}).get(site, {})}
+            for site in PLATFORMS
+        }
+
+        cache = EpisodeCache(**conf.get("cache", {}))
+        download_conf = conf.get("download", {})
+        parser_conf = {key: download_conf[key] for key in ("parser", "parse_processes") if key in download_conf}
+        # ジョブで使うプラットフォームの分だけ読み込む
+        self.sources = LazySources(lambda site: {
+            "max_workers": self.site_conf[site]["concurrency"],
+            "requests_per_second": self.site_conf[site]["requests_per_second"],
+            "cache": cache,
+            **parser_conf,
+        })
+        self.pools = {}
+
+        return
+
+    def get_pool(self, site: str) -> DriverPool:
+        if site not in self.pools:
+            site_conf = self.conf[site]
+            if site_conf["email"] == "" or site_conf["password"] == "":
+                raise ValueError(f"{site} のログイン情報が設定されていません")
+
+            self.pools[site] = DriverPool(
+                get_driver_class(site), self.conf_path,
+                size=self.site_conf[site]["concurrency"],
+                limiter=HostRateLimiter(self.site_conf[site]["requests_per_second"]),
+            )
+        return self.pools[site]
+
+    def run(self, jobs: list) -> list:
+        pipeline_conf = self.conf.get("pipeline", {})
+        results = []
+        futures = []
+
+        # なろうの作品情報はまとめて先に取得しておく (open_work はキャッシュから読む)
+        narou_works = [job["work"] for job in jobs if job["source"] == "narou"]
+        if len(narou_works) > 1:
+            try:
+                self.sources["narou"].get_works_info(narou_works)
+            except Exception as e:
+                logger.warning(f"⚠️ 作品情報をまとめて取得できませんでした: {e}")
+
+        try:
+            for job in jobs:
+                result = {"job": job, "title": None, "status": "pending", "error": None, "elapsed": 0.0}
+                results.append(result)
+                try:
+                    work = open_work(job["source"], job["work"], self.sources)
+                    if work is None:
+                        raise ValueError("作品情報を取得できませんでした")
+
+                    result["title"] = work["title"]
+                    manifest = SyncManifest(work["source_id"], job["management_url"], **self.conf.get("manifest", {}))
+
+                    # ダウンロードはプールのジョブが動き出してから始める
+                    def episodes(work=work):
+                        yield from EpisodeStream(work["episodes"](), **pipeline_conf)
+
+                    started = time.monotonic()
+                    future = self.get_pool(job["destination"]).submit(
+                        job["management_url"], episodes(), manifest, work["total"]
+                    )
+                    futures.append((result, started, future))
+                    logger.info(f"🗂️ ジョブを登録しました: {work['title']} ({job['source']} → {job['destination']})")
+                except Exception as e:
+                    logger.error(f"❌ ジョブを登録できませんでした ({job['work']}): {e}")
+                    result["status"] = "failed"
+                    result["error"] = str(e)
+
+            for result, started, future in futures:
+                try:
+                    result["status"] = "done" if future.result() else "interrupted"
+                except Exception as e:
+                    logger.error(f"❌ {result['title']}: 投稿処理に失敗しました: {e}", exc_info=True)
+                    result["status"] = "failed"
+                    result["error"] = str(e)
+                result["elapsed"] = round(time.monotonic() - started, 1)
+        finally:
+            for pool in self.pools.values():
+                pool.close()
+            self.pools = {}
+
+        return results
+
+    def close(self):
+        # ダウンロード用のインスタンスは実行をまたいで使い回すので、使い終わったときにまとめて閉じる
+        self.sources.close()
+        return
+
+
+def print_report(results: list):
+    icons = {"done": "✅", "interrupted": "⚠️", "failed": "❌", "pending": "⏳"}
+    print("========== バッチ実行結果 ==========")
+    for result in results:
+        job = result["job"]
+        line = f"{icons.get(result['status'], '')} [{result['status']}] {result['title'] or job['work']} ({job['source']} → {job['destination']}) {result['elapsed']}s"
+        if result["error"]:
+            line += f" - {result['error']}"
+        print(line)
+    done = sum(1 for result in results if result["status"] == "done")
+    print(f"完了 {done}/{len(results)} 件")
+    return
@@ -0,0 +1,556 @@
+import json
+import time
+import logging
+import requests
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, StaleElementReferenceException, WebDriverException
+from lib.http_uploader import HttpUploader, SubmissionUnconfirmed, UploadFormError
+from utils.manifest import SyncManifest
+from utils.markup import to_destination
+from utils import profiling
+from utils.metrics import metrics
+from utils.session import get_session_store
+from utils.timing import StepTimer
+
+logger = logging.getLogger(__name__)
+
+# 入力欄の value をネイティブの setter で書き換え、エディタが拾う input / change イベントを発火する
+# (React などの制御コンポーネントは element.value = ... の代入だけでは変更を検知しない)
+FILL_SCRIPT = """
+const el = arguments[0];
+const proto = el instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, arguments[1]);
+el.dispatchEvent(new Event('input', { bubbles: true }));
+el.dispatchEvent(new Event('change', { bubbles: true }));
+"""
+
+
+# 軽量モードで読み込まない URL のパターン (画像・動画・フォントと、広告・アクセス解析のスクリプト)
+# 投稿フォームの動作に必要なサイト自身のスクリプトと CSS は止めない
+BLOCKED_URLS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.ico',
+    '*.mp4', '*.webm', '*.mp3', '*.m4a',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*googletagmanager.com*', '*google-analytics.com*', '*doubleclick.net*', '*googlesyndication.com*',
+    '*googleadservices.com*', '*adservice.google.*', '*amazon-adsystem.com*', '*facebook.net*',
+    '*criteo.*', '*microad.*', '*i-mobile.co.jp*', '*yads.yahoo.co.jp*', '*yimg.jp/images/listing*',
+]
+
+# 保存したクッキーをブラウザへ戻すときに Network.setCookies へ渡せる項目
+COOKIE_PARAMS = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite', 'expires')
+
+
+def dom_length(text: str) -> int:
+    # ブラウザ上の文字数 (UTF-16 単位、改行は LF に正規化される)
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return len(text.encode('utf-16-le')) // 2
+
+
+class BaseDriver:
+    """
+    投稿先サイトのドライバの共通部分。
+    サイトごとの違い (ドメイン、入力欄の name、送信ボタンのセレクタ) はサブクラスのクラス属性で指定する。
+    """
+
+    site_name = ''
+    # config.json の項目名 (ログイン情報やセッションの保存先に使う)
+    site_key = ''
+    domain = ''
+    wrong_site_hint = ''
+    title_field = 'title'
+    body_field = 'body'
+    # 上から順に試す送信ボタンのセレクタ
+    submit_selectors = [(By.CSS_SELECTOR, 'button[type=submit]')]
+    # 要素の表示や送信完了を待つ最大時間
+    wait_timeout = 15
+
+    # ログインしていないとログインページ (URL に login_path を含む) へ転送されるページ。保存したセッションの確認に使う
+    session_check_url = ''
+    login_path = '/login'
+
+    # 一時的な失敗 (読み込みのタイムアウトなど) を再試行する回数と初回の待ち時間
+    max_retries = 2
+    retry_delay = 2.0
+
+    # 本文を send_keys で1文字ずつ打たずに、スクリプトで一括入力する
+    fast_fill = True
+
+    # "browser": ブラウザで投稿 / "http": ログイン済みのクッキーでフォームを直接送信
+    backend = 'browser'
+
+    # ブラウザでの投稿時、送信の確認を待つ間に別のタブで次のエピソードを読み込んで入力しておく
+    pipeline = False
+
+    # 画面を表示せずに動かす / 投稿に不要なリソースを読み込まない
+    headless = False
+    block_resources = False
+    window_size = '1280,1600'
+
+    def __init__(self, conf: str):
+        with open(conf, 'r', encoding='utf-8') as f:
+            self.login_data = json.load(f)
+
+        browser_conf = self.login_data.get('browser', {})
+        self.headless = browser_conf.get('headless', self.headless)
+        self.block_resources = browser_conf.get('block_resources', self.block_resources)
+        self.blocked_urls = BLOCKED_URLS + browser_conf.get('blocked_urls', [])
+
+        # Seleniumのログを完全に抑制
+        options = webdriver.ChromeOptions()
+        options.add_experimental_option('excludeSwitches', ['enable-logging'])
+        options.add_argument('--log-level=3')
+        options.add_argument('--disable-logging')
+
+        if self.headless:
+            options.add_argument('--headless=new')
+            options.add_argument(f"--window-size={browser_conf.get('window_size', self.window_size)}")
+        if self.block_resources:
+            # 画像は設定でも止めておく (URL のパターンに当たらない画像もあるため)
+            options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+            options.add_argument('--disable-extensions')
+            options.add_argument('--mute-audio')
+            # DOMContentLoaded で driver.get から戻る (その後は入力欄などを明示的に待つ)
+            options.page_load_strategy = 'eager'
+
+        # ログイン状態の保存先。profile の場合はプロファイルごと使い回す
+        self.session_store = get_session_store(self.login_data.get('session'))
+        self.profile_dir = None
+        if self.session_store is not None and self.session_store.mode == 'profile':
+            self.profile_dir = self.session_store.acquire_profile(self.site_key)
+            options.add_argument(f'--user-data-dir={self.profile_dir}')
+
+        # 暗黙の待機は使わず、必要な箇所だけ条件付きで明示的に待つ
+        try:
+            self.driver = webdriver.Chrome(options=options)
+        except Exception:
+            if self.profile_dir is not None:
+                self.session_store.release_profile(self.site_key, self.profile_dir)
+            raise
+        if not self.headless:
+            self.driver.maximize_window()
+        self.configure_tab()
+
+        upload_conf = self.login_data.get('upload', {})
+        self.max_retries = upload_conf.get('max_retries', self.max_retries)
+        self.retry_delay = upload_conf.get('retry_delay', self.retry_delay)
+        self.fast_fill = upload_conf.get('fast_fill', self.fast_fill)
+        self.backend = upload_conf.get('backend', self.backend)
+        self.pipeline = upload_conf.get('pipeline', self.pipeline)
+        self.http_uploader = None
+        # 投稿のたびに待つリミッタ (複数のドライバで共有できる)
+        self.limiter = None
+        # 投稿中のエピソードの番号と、タブごとの読み込み前のページ (先読み用)
+        self.current_number = 1
+        self._old_roots = {}
+        # 投稿の段階ごとの所要時間 (実行全体の計測値にも記録する)
+        self.timings = StepTimer('upload_step_seconds', site=self.site_key)
+
+        return
+
+    def login(self):
+        raise NotImplementedError
+
+    def get_post_url(self, work_url: str) -> str:
+        """エピソード投稿フォームのURL"""
+        return work_url
+
+    def ensure_login(self):
+        """保存済みのログイン状態が使えればそれを使い、期限切れなどで使えなければログインする"""
+        if self.session_store is not None and self.restore_session():
+            logger.info(f"✅ 保存済みのログイン状態を再利用します ({self.site_name})")
+            return
+
+        self.login()
+        self.save_session()
+        return
+
+    def browser_cookies(self) -> list:
+        # ページを開かなくても取得できるよう DevTools Protocol を使う (get_cookies は表示中のドメインの分しか返さない)
+        cookies = self.driver.execute_cdp_cmd('Network.getAllCookies', {})['cookies']
+        return [cookie for cookie in cookies if cookie['domain'].lstrip('.').endswith(self.domain)]
+
+    def restore_session(self) -> bool:
+        if self.session_store.mode == 'cookies':
+            cookies = self.session_store.load_cookies(self.site_key)
+        else:
+            cookies = self.browser_cookies()
+        if not cookies:
+            return False
+
+        if not self.session_is_valid(cookies):
+            logger.info(f"🔑 保存済みのログイン状態が使えないため、ログインし直します ({self.site_name})")
+            return False
+
+        if self.session_store.mode == 'cookies':
+            params = []
+            for cookie in cookies:
+                param = {key: cookie[key] for key in COOKIE_PARAMS if key in cookie}
+                if cookie.get('session') or param.get('expires', -1) < 0:
+                    param.pop('expires', None)
+                params.append(param)
+            self.driver.execute_cdp_cmd('Network.setCookies', {'cookies': params})
+        return True
+
+    def session_is_valid(self, cookies: list) -> bool:
+        """ブラウザでページを開かずに、クッキーだけを付けた1回のリクエストでログイン状態を確かめる"""
+        session = requests.Session()
+        session.headers.update({
+            'User-Agent': self.driver.execute_script("return navigator.userAgent")
+        })
+        for cookie in cookies:
+            session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'), path=cookie.get('path', '/'))
+
+        try:
+            response = session.get(self.session_check_url, timeout=self.wait_timeout)
+        except requests.RequestException as e:
+            logger.debug(f"ログイン状態を確認できませんでした: {e}")
+            return False
+        finally:
+            session.close()
+
+        return response.ok and self.login_path not in response.url
+
+    def save_session(self):
+        # profile の場合はブラウザがプロファイルに書き込むので何もしない
+        if self.session_store is None or self.session_store.mode != 'cookies':
+            return
+
+        try:
+            self.session_store.save_cookies(self.site_key, self.browser_cookies())
+        except Exception:
+            logger.warning("⚠️ ログイン状態を保存できませんでした", exc_info=True)
+        return
+
+    def close(self):
+        # 更新されたクッキーを保存してからブラウザを閉じる
+        self.save_session()
+        try:
+            self.driver.quit()
+        finally:
+            if self.profile_dir is not None:
+                self.session_store.release_profile(self.site_key, self.profile_dir)
+                self.profile_dir = None
+        return
+
+    def configure_tab(self):
+        """表示中のタブにヘッドレス・軽量モードの設定を適用する (DevTools の設定はタブごとに必要)"""
+        if self.headless:
+            # ヘッドレスの User-Agent (HeadlessChrome) はボットとして扱われることがあるので、通常の Chrome に見せる
+            user_agent = self.driver.execute_script("return navigator.userAgent").replace('HeadlessChrome', 'Chrome')
+            self.driver.execute_cdp_cmd('Network.setUserAgentOverride', {'userAgent': user_agent})
+        if self.block_resources:
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.blocked_urls})
+        return
+
+    def wait(self, timeout: float | None = None) -> WebDriverWait:
+        return WebDriverWait(self.driver, timeout or self.wait_timeout)
+
+    def find_first(self, locators: list):
+        """locators を上から順に待たずに探し、最初に見つかった要素を返す (無ければ None)"""
+        for by, selector in locators:
+            elements = self.driver.find_elements(by, selector)
+            if elements:
+                return elements[0]
+            logger.debug(f"{selector} が見つからないため、代替セレクタを試行")
+        return None
+
+    def find_submit_button(self):
+        # 送信ボタンはいずれかのセレクタで見つかるまで待つ
+        return self.wait().until(lambda driver: self.find_first(self.submit_selectors))
+
+    def wait_for_submission(self, before_url: str, form_element):
+        """送信後、URL が変わるか入力フォームが DOM から外れるまで待つ"""
+        def submitted(driver):
+            if driver.current_url != before_url:
+                return True
+            try:
+                form_element.is_enabled()
+                return False
+            except StaleElementReferenceException:
+                return True
+
+        try:
+            self.wait().until(submitted)
+        except TimeoutException:
+            raise SubmissionUnconfirmed(f"投稿の完了を確認できませんでした (現在のURL: {self.driver.current_url})")
+        return
+
+    @contextmanager
+    def after_submit(self):
+        """
+        送信ボタンを押した後の処理を囲む。ここで起きた例外はすべて SubmissionUnconfirmed にする。
+        (click() 自体が送信後の画面遷移を待つ間にタイムアウトすることもあり、やり直すと二重投稿になりうる)
+        """
+        try:
+            yield
+        except SubmissionUnconfirmed:
+            raise
+        except Exception as e:
+            raise SubmissionUnconfirmed(f"送信後にエラーが発生したため、投稿されたか確認できませんでした: {e.__class__.__name__}: {e}") from e
+
+    def fill_field(self, element, text: str):
+        if self.fast_fill:
+            self.driver.execute_script(FILL_SCRIPT, element, text)
+            stored = dom_length(element.get_property('value') or '')
+            if stored == dom_length(text):
+                return
+
+            logger.debug(f"一括入力の検証に失敗したため send_keys で入力し直します ({stored}/{dom_length(text)} 文字)")
+
+        element.clear()
+        element.send_keys(text)
+        return
+
+    def wait_for_form(self):
+        # タイトルと本文の入力欄が表示されるまで待機
+        wait = self.wait()
+        title_el = wait.until(EC.presence_of_element_located((By.NAME, self.title_field)))
+        body_el = wait.until(EC.presence_of_element_located((By.NAME, self.body_field)))
+        return title_el, body_el
+
+    def fill_form(self, title_el, body_el, episode: dict):
+        self.fill_field(title_el, episode.get('title', ''))
+        self.fill_field(body_el, episode.get('content', ''))
+        return
+
+    def format_episode(self, episode: dict) -> dict:
+        # ルビと傍点を投稿先の記法にする
+        return {**episode, 'content': to_destination(episode.get('content', ''), self.site_key)}
+
+    def post_episode(self, post_url: str, episode: dict):
+        with self.timings.step('読み込み'):
+            self.driver.get(post_url)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"現在のURL: {self.driver.current_url}")
+            title_el, body_el = self.wait_for_form()
+
+        # 入力欄に新しい内容を入力
+        with self.timings.step('入力'):
+            self.fill_form(title_el, body_el, episode)
+
+        # 送信ボタンを押し、ページが切り替わるまで待つ (押す前までは再試行してよい)
+        with self.timings.step('送信'):
+            before_url = self.driver.current_url
+            button = self.find_submit_button()
+            with self.after_submit():
+                button.click()
+                self.wait_for_submission(before_url, body_el)
+        return
+
+    def submit_episode(self, post_url: str, episode: dict):
+        episode = self.format_episode(episode)
+        if self.http_uploader is not None:
+            try:
+                with self.timings.step('HTTP送信'):
+                    return self.http_uploader.post_episode(post_url, episode)
+            except UploadFormError as e:
+                logger.warning(f"⚠️ HTTP で投稿できないため、ブラウザでの投稿に切り替えます: {e}")
+                self.http_uploader = None
+
+        return self.post_episode(post_url, episode)
+
+    def post_episode_with_retry(self, post_url: str, episode: dict):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.submit_episode(post_url, episode)
+            except (WebDriverException, requests.RequestException) as e:
+                if attempt >= self.max_retries:
+                    raise
+
+                delay = self.retry_delay * (2 ** attempt)
+                metrics.count('upload_retries', site=self.site_key, reason=e.__class__.__name__)
+                logger.warning(f"🔁 投稿に失敗したため {delay:.0f} 秒後に再試行します ({attempt + 1}/{self.max_retries}): {e.__class__.__name__}")
+                time.sleep(delay)
+
+        return
+
+    def start_loading(self, handle: str, url: str):
+        """タブ handle で url の読み込みを始める (読み込みの完了は待たない)"""
+        self.driver.switch_to.window(handle)
+        # 読み込み前のページの要素を覚えておき、それが消えたことで新しいページに切り替わったと判断する
+        self._old_roots[handle] = self.driver.find_element(By.TAG_NAME, 'html')
+        self.driver.execute_script("window.location.href = arguments[0];", url)
+        return
+
+    def prepare_form(self, handle: str, episode: dict):
+        """start_loading したタブで入力欄を待って入力し、(タイトル, 本文) の要素を返す"""
+        self.driver.switch_to.window(handle)
+        with self.timings.step('先読み'):
+            old_root = self._old_roots.pop(handle, None)
+            if old_root is not None:
+                self.wait().until(EC.staleness_of(old_root))
+            title_el, body_el = self.wait_for_form()
+        with self.timings.step('先行入力'):
+            self.fill_form(title_el, body_el, episode)
+        return title_el, body_el
+
+    def prepare_form_with_retry(self, handle: str, post_url: str, episode: dict):
+        # まだ送信していないので、読み込みと入力は何度やり直してもよい
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.start_loading(handle, post_url)
+                return self.prepare_form(handle, episode)
+            except WebDriverException as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.retry_delay * (2 ** attempt)
+                metrics.count('upload_retries', site=self.site_key, reason=e.__class__.__name__)
+                logger.warning(f"🔁 投稿ページの準備に失敗したため {delay:.0f} 秒後に再試行します ({attempt + 1}/{self.max_retries}): {e.__class__.__name__}")
+                time.sleep(delay)
+        return None
+
+    def iter_sequential(self, post_url: str, targets, total: int | None):
+        """1つのタブで1話ずつ読み込み・入力・送信し、投稿できたものから (番号, エピソード) を返す"""
+        for number, episode in targets:
+            self.current_number = number
+            logger.info(f"📤 エピソード {number}/{total or '?'} を投稿中: {episode.get('title', '(タイトルなし)')}")
+            self.timings.start_round()
+            if self.limiter is not None:
+                self.limiter.wait(post_url)
+            with profiling.unit('upload', number):
+                self.post_episode_with_retry(post_url, episode)
+            yield number, episode
+
+    def iter_pipelined(self, post_url: str, targets, total: int | None):
+        """
+        2つのタブを交互に使い、1つのタブで送信の確認を待つ間に、もう1つのタブで次のエピソードを読み込んで入力しておく。
+        送信は必ず前のエピソードの投稿を確認してから行うので、投稿の順番は変わらない。
+        """
+        targets = iter(targets)
+        current = next(targets, None)
+        if current is None:
+            return
+
+        self._old_roots = {}
+        first_tab = self.driver.current_window_handle
+        self.driver.switch_to.new_window('tab')
+        self.configure_tab()
+        tabs = [first_tab, self.driver.current_window_handle]
+        try:
+            tab = 0
+            self.current_number = current[0]
+            form = self.prepare_form_with_retry(tabs[tab], post_url, self.format_episode(current[1]))
+            while current is not None:
+                number, episode = current
+                self.current_number = number
+                logger.info(f"📤 エピソード {number}/{total or '?'} を投稿中: {episode.get('title', '(タイトルなし)')}")
+                self.timings.start_round()
+                if self.limiter is not None:
+                    self.limiter.wait(post_url)
+
+                # 次のエピソードの事前入力も、この話の投稿の一部として計測する
+                with profiling.unit('upload', number):
+                    self.driver.switch_to.window(tabs[tab])
+                    before_url = self.driver.current_url
+                    button = self.find_submit_button()
+                    with self.after_submit():
+                        button.click()
+
+                    # 確認を待つ間に、もう一方のタブで次のエピソードを準備する (失敗しても、確認の後でやり直す)
+                    upcoming = next(targets, None)
+                    next_form = None
+                    if upcoming is not None:
+                        try:
+                            self.start_loading(tabs[1 - tab], post_url)
+                            next_form = self.prepare_form(tabs[1 - tab], self.format_episode(upcoming[1]))
+                        except WebDriverException as e:
+                            logger.warning(f"⚠️ 次のエピソードを事前に入力できませんでした。送信の確認後に入力し直します: {e.__class__.__name__}")
+
+                    with self.timings.step('送信待ち'), self.after_submit():
+                        self.driver.switch_to.window(tabs[tab])
+                        self.wait_for_submission(before_url, form[1])
+                yield number, episode
+
+                current = upcoming
+                tab = 1 - tab
+                if current is not None:
+                    form = next_form or self.prepare_form_with_retry(tabs[tab], post_url, self.format_episode(current[1]))
+        finally:
+            try:
+                self.driver.switch_to.window(tabs[1])
+                self.driver.close()
+                self.driver.switch_to.window(first_tab)
+            except WebDriverException:
+                logger.debug("追加のタブを閉じられませんでした", exc_info=True)
+
+    def episode_auto_input(self, work_url: str, episodes_data, manifest: SyncManifest | None = None,
+                           total: int | None = None):
+        """
+        投稿がすべて完了したら True、途中で中断した場合は False を返す。
+        episodes_data はリストのほか、ダウンロード中のエピソードを順に返すイテレータでもよい。
+        その場合は届いたものから順に投稿する。
+        """
+        # ドメインチェック
+        if self.domain not in work_url:
+            logger.error(f"❌ 提供されたURLは{self.site_name}のURLではありません: {work_url}")
+            logger.error(f"💡 ヒント: {self.wrong_site_hint}")
+            return False
+
+        # URL正規化（末尾スラッシュを除去して重複を防ぐ）
+        post_url = self.get_post_url(work_url.rstrip('/'))
+        logger.info(f"📝 エピソード投稿URL: {post_url}")
+
+        # ログイン済みのセッションを HTTP 投稿に引き継ぐ
+        if self.backend == 'http' and self.http_uploader is None:
+            logger.info("🌐 ブラウザのログイン状態を引き継いで HTTP で投稿します")
+            self.http_uploader = HttpUploader.from_driver(self)
+
+        if total is None and isinstance(episodes_data, list):
+            total = len(episodes_data)
+
+        # マニフェストがあれば未投稿のエピソードだけを投稿し、内容が変わったものは知らせる
+        if manifest is not None:
+            targets = manifest.iter_pending(episodes_data)
+        else:
+            targets = enumerate(episodes_data, 1)
+
+        # HTTP で投稿する場合はページの読み込みが無いので、タブの先読みは使わない
+        if self.pipeline and self.http_uploader is None:
+            logger.info("🗂️ 2つのタブで次のエピソードを先読みしながら投稿します")
+            steps = self.iter_pipelined(post_url, targets, total)
+        else:
+            steps = self.iter_sequential(post_url, targets, total)
+
+        posted = 0
+        self.current_number = 1
+        try:
+            for number, episode in steps:
+                # 投稿できたものから順にジャーナルへ記録する (中断しても次回はここから再開できる)
+                if manifest is not None:
+                    manifest.record(number, episode)
+                posted += 1
+                metrics.count('episodes_posted', site=self.site_key)
+                logger.info(f"  ✅ エピソード {number}/{total or '?'} の投稿完了 ({self.timings.format_last()})")
+
+        except TimeoutException:
+            logger.error(f"❌ タイムアウト: 入力欄または送信ボタンが見つかりませんでした")
+            logger.error(f"現在のURL: {self.driver.current_url}")
+            # page_source はブラウザとの通信が発生するので、DEBUG ログを出すときだけ取得する
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("--- ページソースの一部 ---")
+                logger.debug(self.driver.page_source[:1500])
+                logger.debug("--- 終了 ---")
+            self._log_resume_hint(manifest, self.current_number)
+            return False
+        except Exception as e:
+            logger.error(f"❌ 予期しないエラーが発生しました: {e}", exc_info=True)
+            self._log_resume_hint(manifest, self.current_number)
+            return False
+
+        if manifest is not None:
+            manifest.close()
+        logger.info(f"🎉 全 {posted} エピソードの投稿が完了しました！")
+        if posted:
+            logger.info(f"⏱️ 1話あたりの所要時間: {self.timings.format_summary()}")
+        return True
+
+    @staticmethod
+    def _log_resume_hint(manifest: SyncManifest | None, number: int):
+        if manifest is not None:
+            logger.info(f"💾 ここまでの投稿は記録済みです。同じ作品で再実行すると第{number}話から再開します")
+        return
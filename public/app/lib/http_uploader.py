@@ -0,0 +1,151 @@
+import logging
+from urllib.parse import urljoin
+import requests
+from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+from utils.fetcher import HostRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class UploadFormError(Exception):
+    """投稿フォームが HTML から見つからない (JavaScript で描画されるなど) 場合の例外。送信前にしか送出しない"""
+    pass
+
+
+class SubmissionUnconfirmed(Exception):
+    """送信した後、投稿が完了したことを確認できなかった場合の例外 (二重投稿を避けるため再試行しない)"""
+    pass
+
+
+def to_css(by: str, value: str) -> str:
+    # Selenium のロケータを BeautifulSoup の CSS セレクタに変換する
+    if by == By.ID:
+        return f'#{value}'
+    if by == By.NAME:
+        return f'[name="{value}"]'
+    if by == By.CSS_SELECTOR:
+        return value
+    raise ValueError(f"CSSセレクタに変換できないロケータです: {by}")
+
+
+class HttpUploader:
+    """
+    Selenium でログインしたブラウザのクッキーを requests のセッションへ引き継ぎ、
+    エピソードの投稿フォームをブラウザを使わずに HTTP で直接送信する。
+    フォームの hidden 項目 (CSRF トークンなど) は投稿ページから毎回読み取る。
+    """
+
+    def __init__(self, session: requests.Session, title_field: str, body_field: str, submit_selectors: list,
+                 requests_per_second: float = 1.0):
+        self.session = session
+        self.title_field = title_field
+        self.body_field = body_field
+        self.submit_selectors = submit_selectors
+        self.limiter = HostRateLimiter(requests_per_second)
+
+        return
+
+    @classmethod
+    def from_driver(cls, driver, **kwargs):
+        session = requests.Session()
+        session.headers.update({
+            'User-Agent': driver.driver.execute_script("return navigator.userAgent")
+        })
+        # 保存済みのログイン状態を復元した直後はページを開いていないので、表示中のドメインに限らず取得する
+        for cookie in driver.browser_cookies():
+            session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'), path=cookie.get('path', '/'))
+
+        return cls(session, driver.title_field, driver.body_field, driver.submit_selectors, **kwargs)
+
+    def find_form(self, html: BeautifulSoup):
+        """(フォーム, 送信ボタン) を返す。本文の入力欄を含むフォームを投稿フォームとみなす"""
+        for by, selector in self.submit_selectors:
+            button = html.select_one(to_css(by, selector))
+            if button is None:
+                continue
+
+            form = html.find('form', id=button['form']) if button.get('form') else button.find_parent('form')
+            if form is not None and self._fields(html, form, self.body_field):
+                return form, button
+
+        body = html.find(attrs={'name': self.body_field})
+        form = body.find_parent('form') if body is not None else None
+        if form is None:
+            raise UploadFormError("投稿フォームが見つかりませんでした")
+        return form, None
+
+    @staticmethod
+    def _fields(html: BeautifulSoup, form, name: str | None = None) -> list:
+        # form 要素の中身と、form="..." 属性でフォームに属する要素を集める
+        elements = form.find_all(['input', 'textarea', 'select'])
+        if form.get('id'):
+            elements += html.find_all(['input', 'textarea', 'select'], attrs={'form': form['id']})
+        if name is not None:
+            elements = [el for el in elements if el.get('name') == name]
+        return elements
+
+    def build_payload(self, html: BeautifulSoup, form, button, episode: dict) -> list:
+        payload = []
+        for el in self._fields(html, form):
+            name = el.get('name')
+            if not name or el.has_attr('disabled'):
+                continue
+
+            if el.name == 'textarea':
+                value = el.text
+            elif el.name == 'select':
+                option = el.find('option', selected=True) or el.find('option')
+                value = option.get('value', option.text) if option is not None else ''
+            else:
+                input_type = (el.get('type') or 'text').lower()
+                if input_type in ('submit', 'button', 'image', 'reset', 'file'):
+                    continue
+                if input_type in ('checkbox', 'radio') and not el.has_attr('checked'):
+                    continue
+                value = el.get('value', 'on' if input_type in ('checkbox', 'radio') else '')
+
+            if name == self.title_field:
+                value = episode.get('title', '')
+            elif name == self.body_field:
+                value = episode.get('content', '')
+            payload.append((name, value))
+
+        # 押したボタンの name / value も送る (下書きと公開をボタンで切り替えるフォームがあるため)
+        if button is not None and button.get('name'):
+            payload.append((button['name'], button.get('value', '')))
+        return payload
+
+    def post_episode(self, post_url: str, episode: dict):
+        response = self.limiter.get(self.session, post_url)
+        response.raise_for_status()
+
+        html = BeautifulSoup(response.text, 'html.parser')
+        form, button = self.find_form(html)
+        payload = self.build_payload(html, form, button, episode)
+
+        action = (button.get('formaction') if button is not None else None) or form.get('action') or response.url
+        method = ((button.get('formmethod') if button is not None else None) or form.get('method') or 'post').lower()
+        action = urljoin(response.url, action)
+
+        logger.debug(f"フォームを送信: {method.upper()} {action}")
+        # ここから先は送信が処理された可能性があるので、どんな失敗も再試行やブラウザでの投稿し直しの対象にしない
+        try:
+            if method == 'get':
+                result = self.limiter.get(self.session, action, params=payload, headers={'Referer': response.url})
+            else:
+                result = self.limiter.post(self.session, action, data=payload, headers={'Referer': response.url})
+            if not result.ok:
+                raise SubmissionUnconfirmed(f"フォームの送信に失敗しました (HTTP {result.status_code})")
+
+            # 送信後も同じフォームがそのまま返ってきた場合は入力エラーとみなす
+            result_html = BeautifulSoup(result.text, 'html.parser')
+            body = result_html.find(attrs={'name': self.body_field})
+            if result.url == response.url and body is not None and body.text.strip() == episode.get('content', '').strip():
+                raise SubmissionUnconfirmed("フォームが受け付けられませんでした (入力エラーの可能性があります)")
+        except SubmissionUnconfirmed:
+            raise
+        except Exception as e:
+            raise SubmissionUnconfirmed(f"送信後にエラーが発生したため、投稿されたか確認できませんでした: {e.__class__.__name__}: {e}") from e
+
+        return
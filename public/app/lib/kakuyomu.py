@@ -1,179 +1,117 @@
 import json
-import requests
-import time
+import re
 import logging
 from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from lib.source import BaseSource
+from utils.fetcher import FetchError
+from utils import profiling
 
 logger = logging.getLogger(__name__)
 
 
 
-class KakuyomuData:
-    def __init__(self):
-        self.url = 'https://kakuyomu.jp'
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0"
-        })
-
-        return
-
-    def get_absolute_url(self, link):
-        return self.url + link
+class KakuyomuData(BaseSource):
+    url = 'https://kakuyomu.jp'
+    episode_selectors = {
+        "title": ".widget-episodeTitle",
+        "content": ".widget-episodeBody",
+    }
+
+    def get_episode_url(self, work_id: str, episode_id: str) -> str:
+        return self.get_absolute_url(f"/works/{work_id}/episodes/{episode_id}")
+
+    @staticmethod
+    def get_apollo_state(html: BeautifulSoup) -> dict | None:
+        # 作品ページに埋め込まれた Next.js のページ状態 (Apollo キャッシュ) を取り出す
+        script = html.select_one('script#__NEXT_DATA__')
+        if script is None or not script.string:
+            return None
+
+        try:
+            next_data = json.loads(script.string)
+            return next_data['props']['pageProps']['__APOLLO_STATE__']
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    @staticmethod
+    def get_toc_episode_ids(state: dict, work: dict) -> list:
+        # 目次 (章 → エピソード) の参照を順にたどってエピソードIDを並べる
+        def resolve(ref):
+            if isinstance(ref, dict) and '__ref' in ref:
+                return state.get(ref['__ref'], {})
+            return ref or {}
+
+        toc = work.get('tableOfContentsV2') or work.get('tableOfContents') or []
+        episode_ids = []
+        for chapter_ref in toc:
+            chapter = resolve(chapter_ref)
+            for episode_ref in chapter.get('episodeUnions') or []:
+                episode = resolve(episode_ref)
+                if episode.get('__typename', 'Episode') == 'Episode' and episode.get('id'):
+                    episode_ids.append(episode['id'])
+
+        return episode_ids
 
     def get_work_info(self, link: str) -> dict | None:
-        response = self.session.get(link)
-        data = {}
-        if response.ok:
-            html = BeautifulSoup(response.text, 'html.parser')
-            data['id'] = link.split('/')[-1]
-            data['title'] = html.select_one('h1.Heading_heading__lQ85n.Heading_left__RVp4h.Heading_size-2l__rAFn3').text
-            author = html.select_one('.partialGiftWidgetActivityName a')
-            data['author_name'] = author.text
-            data['author_url'] = self.get_absolute_url(author['href'])
-            data['first_url'] = self.get_absolute_url(html.select_one(
-                '.Layout_layout__5aFuw.Layout_items-normal__4mOqD.Layout_justify-normal__zqNe7.Layout_direction-row__boh0Z.Layout_wrap-wrap__yY3zM.Layout_gap-2s__xUCm0 a')[
-                                                          'href'])
-
-            return data
-        return None
-
-    def get_episodes(self, first_url: str) -> list | None:
-        episode_url = first_url
-        episodes_data = []
-
-        while True:
-            logger.info(f"📥 エピソードをダウンロード中: {episode_url}")
-            response = self.session.get(episode_url)
-            if not response.ok:
-                logger.warning(f"⚠️ エピソードの取得に失敗しました (HTTP {response.status_code})")
-                break
-
-            html = BeautifulSoup(response.text, 'html.parser')
-            episode_title = html.select_one(".widget-episodeTitle").text
-            episode_content = html.select_one(".widget-episodeBody").text
-            episode_data = {
-                "url": episode_url,
-                "title": episode_title,
-                "content": episode_content
-            }
-            episodes_data.append(episode_data)
-
-            logger.info(f"  ✅ タイトル: {episode_title}")
-
-            next_url = html.select_one("#contentMain-readNextEpisode")
-            if not next_url:
-                logger.info(f"🎉 全 {len(episodes_data)} エピソードのダウンロード完了")
-                return episodes_data
-
-            episode_url = self.get_absolute_url(next_url['href'])
-
-            time.sleep(1)
-            pass
-
-        return episodes_data
-
-
-
-
-class KakuyomuDriver:
-    def __init__(self, conf: str):
-        # Seleniumのログを完全に抑制
-        options = webdriver.ChromeOptions()
-        options.add_experimental_option('excludeSwitches', ['enable-logging'])
-        options.add_argument('--log-level=3')
-        options.add_argument('--disable-logging')
-        
-        self.driver = webdriver.Chrome(options=options)
-        self.driver.maximize_window()
-        self.driver.implicitly_wait(10)
-        with open(conf, 'r', encoding='utf-8') as f:
-            self.login_data = json.load(f)
-
-        return
-
-    def login(self):
-        kakuyomu_conf = self.login_data['kakuyomu']
-        if kakuyomu_conf['email'] == "" or kakuyomu_conf['password'] == "":
-            logger.error("❌ メールアドレスまたはパスワードが設定されていません")
+        match = re.search(r'/works/(\d+)', link)
+        if match is None:
+            logger.error(f"❌ 作品URLの形式が正しくありません: {link}")
+            return None
+
+        work_id = match.group(1)
+        response = self.limiter.get(self.session, self.get_absolute_url(f"/works/{work_id}"))
+        if not response.ok:
+            return None
+
+        html = self.parser.soup(response.text, ['#__NEXT_DATA__'])
+        state = self.get_apollo_state(html)
+        work = (state or {}).get(f"Work:{work_id}")
+        if work is None:
+            logger.error("❌ 作品ページからページ状態を読み取れませんでした")
+            return None
+
+        episode_ids = self.get_toc_episode_ids(state, work)
+        if not episode_ids:
+            # 目次の形式が変わった場合など。0話のまま「完了」にしないようにする
+            logger.error("❌ 作品ページの目次からエピソードを読み取れませんでした")
+            return None
+        author = state.get((work.get('author') or {}).get('__ref', ''), {})
+
+        data = {
+            'id': work_id,
+            'title': work.get('title'),
+            'author_name': author.get('activityName'),
+            'author_url': self.get_absolute_url(f"/users/{author['name']}") if author.get('name') else None,
+            'episode_urls': [self.get_episode_url(work_id, episode_id) for episode_id in episode_ids],
+            # 更新の検出に使う (ページ状態に無ければ None)
+            'updated_at': work.get('editedAt') or work.get('lastEpisodePublishedAt'),
+            'total_characters': work.get('totalCharacterCount'),
+        }
+        data['first_url'] = data['episode_urls'][0]
+
+        return data
+
+    def iter_episodes(self, work: dict | str):
+        # 目次が分かっていれば全エピソードを並列に取得する
+        if isinstance(work, dict) and work.get('episode_urls'):
+            yield from self.iter_episode_urls(work['episode_urls'])
             return
 
-        logger.info("🔐 カクヨムにログイン中...")
-        self.driver.get("https://kakuyomu.jp/auth/login/email?location=%2F&auth_platform=web")
-        
-        wait = WebDriverWait(self.driver, 15)
-        email = wait.until(EC.presence_of_element_located((By.NAME, "email")))
-        password = self.driver.find_element(By.NAME, "password")
-
-        email.send_keys(kakuyomu_conf['email'])
-        password.send_keys(kakuyomu_conf['password'])
-
-        self.driver.find_element(By.CSS_SELECTOR, "button[type=submit]").click()
-        time.sleep(1)
-        self.driver.get("https://kakuyomu.jp/my")
-        logger.info("✅ ログイン完了")
-        return
+        # 目次が取れない場合は「次のエピソード」リンクをたどる
+        episode_url = work['first_url'] if isinstance(work, dict) else work
 
+        while episode_url:
+            logger.info(f"📥 エピソードをダウンロード中: {episode_url}")
+            with profiling.unit('download', episode_url):
+                response = self.limiter.get(self.session, episode_url)
+                if not response.ok:
+                    raise FetchError(f"エピソードを取得できませんでした (HTTP {response.status_code}): {episode_url}")
 
-    def episode_auto_input(self, work_url: str, episodes_data: list):
-        # ドメインチェック
-        if 'kakuyomu.jp' not in work_url:
-            logger.error(f"❌ 提供されたURLはカクヨムのURLではありません: {work_url}")
-            logger.error("💡 ヒント: 小説家になろうのURLを使用していませんか？")
-            return
+                episode_data = self.parse_episode(episode_url, response.text)
+            logger.info(f"  ✅ タイトル: {episode_data['title']}")
+            yield episode_data
 
-        # URL正規化（末尾スラッシュを除去して重複を防ぐ）
-        work_url = work_url.rstrip('/')
-        new_url = work_url + "/episodes/new"
-        logger.info(f"📝 エピソード投稿URL: {new_url}")
-
-        wait = WebDriverWait(self.driver, 15)
-        total = len(episodes_data)
-
-        for idx, episode in enumerate(episodes_data, 1):
-            try:
-                logger.info(f"📤 エピソード {idx}/{total} を投稿中: {episode.get('title', '(タイトルなし)')}")
-                self.driver.get(new_url)
-                
-                # タイトルと本文の入力欄が表示されるまで待機
-                logger.debug(f"現在のURL: {self.driver.current_url}")
-                title_el = wait.until(EC.presence_of_element_located((By.NAME, "title")))
-                body_el = wait.until(EC.presence_of_element_located((By.NAME, "body")))
-
-                # 入力欄をクリアして新しい内容を入力
-                title_el.clear()
-                title_el.send_keys(episode.get('title', ''))
-
-                body_el.clear()
-                body_el.send_keys(episode.get('content', ''))
-
-                time.sleep(0.5)
-                
-                # 更新/公開ボタンを探してクリック
-                try:
-                    update_btn = self.driver.find_element(By.ID, "updateButton")
-                except NoSuchElementException:
-                    logger.debug("updateButton が見つからないため、代替セレクタを試行")
-                    update_btn = self.driver.find_element(By.CSS_SELECTOR, 'button[type=submit]')
-
-                update_btn.click()
-                logger.info(f"  ✅ エピソード {idx}/{total} の投稿完了")
-                time.sleep(0.5)
-                
-            except TimeoutException:
-                logger.error(f"❌ タイムアウト: タイトルまたは本文の入力欄が見つかりませんでした")
-                logger.error(f"現在のURL: {self.driver.current_url}")
-                logger.debug("--- ページソースの一部 ---")
-                logger.debug(self.driver.page_source[:1500])
-                logger.debug("--- 終了 ---")
-                return
-            except Exception as e:
-                logger.error(f"❌ 予期しないエラーが発生しました: {e}", exc_info=True)
-                return
-
-        logger.info(f"🎉 全 {total} エピソードの投稿が完了しました！")
\ No newline at end of file
+            html = self.parser.soup(response.text, ['#contentMain-readNextEpisode'])
+            next_url = html.select_one("#contentMain-readNextEpisode")
+            episode_url = self.get_absolute_url(next_url['href']) if next_url else None
+            pass
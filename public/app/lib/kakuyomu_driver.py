@@ -0,0 +1,46 @@
+import logging
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from lib.driver import BaseDriver
+
+logger = logging.getLogger(__name__)
+
+
+class KakuyomuDriver(BaseDriver):
+    site_name = 'カクヨム'
+    site_key = 'kakuyomu'
+    domain = 'kakuyomu.jp'
+    wrong_site_hint = '小説家になろうのURLを使用していませんか？'
+    title_field = 'title'
+    body_field = 'body'
+    submit_selectors = [
+        (By.ID, 'updateButton'),
+        (By.CSS_SELECTOR, 'button[type=submit]'),
+    ]
+    session_check_url = 'https://kakuyomu.jp/my'
+
+    def login(self):
+        kakuyomu_conf = self.login_data['kakuyomu']
+        if kakuyomu_conf['email'] == "" or kakuyomu_conf['password'] == "":
+            logger.error("❌ メールアドレスまたはパスワードが設定されていません")
+            return
+
+        logger.info("🔐 カクヨムにログイン中...")
+        self.driver.get("https://kakuyomu.jp/auth/login/email?location=%2F&auth_platform=web")
+
+        wait = self.wait()
+        email = wait.until(EC.presence_of_element_located((By.NAME, "email")))
+        password = wait.until(EC.presence_of_element_located((By.NAME, "password")))
+
+        email.send_keys(kakuyomu_conf['email'])
+        password.send_keys(kakuyomu_conf['password'])
+
+        self.driver.find_element(By.CSS_SELECTOR, "button[type=submit]").click()
+        # ログインページから移動するまで待つ
+        wait.until(lambda driver: '/auth/login' not in driver.current_url)
+        self.driver.get("https://kakuyomu.jp/my")
+        logger.info("✅ ログイン完了")
+        return
+
+    def get_post_url(self, work_url: str) -> str:
+        return work_url + "/episodes/new"
@@ -1,166 +1,146 @@
-import time
+import gzip
 import json
-import requests
+import re
 import logging
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from lib.source import BaseSource
+from utils.cache import EpisodeCache, MetadataCache, cached_fetch
+from utils.fetcher import fetch_all_in_order, fetch_in_order
+from utils import profiling
 
 logger = logging.getLogger(__name__)
 
-class NarouData:
-    def __init__(self):
+EPISODE_LINK = re.compile(r'/(\d+)/?$')
+
+
+class NarouData(BaseSource):
+    # 小説APIで取得する項目 (t: タイトル, n: ncode, ga: 全話数, nu: 最終更新日時) と、1回のリクエストで問い合わせる作品数
+    api_fields = 't-n-ga-nu'
+    api_batch_size = 100
+    # 目次の1ページに載る話数
+    toc_page_size = 100
+
+    def __init__(self, max_workers: int = 4, requests_per_second: float = 2.0, cache: EpisodeCache | None = None,
+                 parser: str | None = None, parse_processes: int = 0):
+        super().__init__(max_workers, requests_per_second, cache, parser, parse_processes)
+        # エピソードの URL は ncode と話数から組み立てる
         self.url = 'https://ncode.syosetu.com/{}/{}'
         self.api_url = 'https://api.syosetu.com/novelapi/api/'
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0"
-        })
+        # 作品情報は有効期限付きでキャッシュする
+        self.metadata = cache.metadata('narou') if cache is not None else MetadataCache()
 
         return
 
     def get_work_info(self, ncode: str):
-        endpoint = self.api_url + "?ncode={}&out=json".format(ncode.lower())
-        response = self.session.get(endpoint)
-        body = response.json()
-        if len(body) == 1:
+        return self.get_works_info([ncode]).get(ncode.lower())
+
+    def get_works_info(self, ncodes: list, refresh: bool = False) -> dict:
+        """
+        複数の作品の情報を ncode (小文字) をキーにした辞書で返す。見つからない作品は None。
+        キャッシュに無いもの (refresh なら全部) を api_batch_size 件ずつまとめて小説APIに問い合わせる。
+        """
+        ncodes = list(dict.fromkeys(ncode.lower() for ncode in ncodes))
+        works = {ncode: None if refresh else self.metadata.get(ncode) for ncode in ncodes}
+        missing = [ncode for ncode, work in works.items() if work is None]
+        if len(missing) < len(ncodes):
+            logger.debug(f"作品情報をキャッシュから取得: {len(ncodes) - len(missing)} 件")
+
+        for start in range(0, len(missing), self.api_batch_size):
+            fetched = self.fetch_works_info(missing[start:start + self.api_batch_size])
+            self.metadata.put_many(fetched)
+            works.update(fetched)
+
+        return works
+
+    def fetch_works_info(self, ncodes: list) -> dict:
+        # gzip=5 を付けると圧縮した JSON が返る (Content-Encoding は付かないので自前で展開する)
+        params = {
+            'ncode': '-'.join(ncodes),
+            'of': self.api_fields,
+            'lim': len(ncodes),
+            'out': 'json',
+            'gzip': 5,
+        }
+        response = self.limiter.get(self.session, self.api_url, params=params)
+        response.raise_for_status()
+        data = response.content
+        if data[:2] == b'\x1f\x8b':
+            data = gzip.decompress(data)
+
+        # 先頭の要素は件数 ({"allcount": n})
+        body = json.loads(data)
+        works = {work['ncode'].lower(): work for work in body[1:]}
+        return {ncode: works.get(ncode) for ncode in ncodes}
+
+    def get_episode(self, ncode: str, number: int, total: int | str = '?', version: str | None = None) -> dict | None:
+        endpoint = self.url.format(ncode, number)
+        logger.info(f"📥 エピソード {number}/{total} をダウンロード中: {endpoint}")
+
+        # その話の掲載・改稿日時 (version) が変わっていなければキャッシュをそのまま使う
+        with profiling.unit('download', endpoint):
+            episode_data, response = cached_fetch(
+                self.cache, self.session, endpoint, self.parse_episode,
+                version=version, limiter=self.limiter,
+            )
+        if episode_data is None:
+            logger.warning(f"⚠️ エピソード {number} の取得に失敗しました (HTTP {response.status_code})")
             return None
 
-        return body[1]
-
-    def get_episodes(self, api_response: dict):
-        ncode: str = api_response['ncode'].lower()
-        all_count = api_response['general_all_no']
-        episodes_data = []
-
-        for i in range(int(all_count)):
-            endpoint = self.url.format(ncode, i + 1)
-            logger.info(f"📥 エピソード {i+1}/{all_count} をダウンロード中: {endpoint}")
-
-            response = self.session.get(endpoint)
-            if not response.ok:
-                logger.warning(f"⚠️ エピソードの取得に失敗しました (HTTP {response.status_code})")
-                break
-
-            html = BeautifulSoup(response.text, 'html.parser')
-            episode_title = html.select_one(".p-novel__title").text
-            episode_content = html.select_one(".p-novel__text").text
-            episodes_data.append({
-                "title": episode_title,
-                "content": episode_content
-            })
-            logger.info(f"  ✅ タイトル: {episode_title}")
-            time.sleep(1)
-            pass
-
-        logger.info(f"🎉 全 {len(episodes_data)} エピソードのダウンロード完了")
-        return episodes_data
-
-
-class NarouDriver:
-    def __init__(self, conf):
-        # Seleniumのログを完全に抑制
-        options = webdriver.ChromeOptions()
-        options.add_experimental_option('excludeSwitches', ['enable-logging'])
-        options.add_argument('--log-level=3')
-        options.add_argument('--disable-logging')
-        
-        self.driver = webdriver.Chrome(options=options)
-        self.driver.maximize_window()
-        self.driver.implicitly_wait(10)
-        with open(conf, 'r', encoding='utf-8') as f:
-            self.login_data = json.load(f)
-
-        return
+        logger.info(f"  ✅ タイトル: {episode_data['title']}{' (キャッシュ)' if response is None or response.status_code == 304 else ''}")
+        return episode_data
 
-    def login(self):
-        narou_conf = self.login_data['narou']
-        logger.info("🔐 小説家になろうにログイン中...")
-        self.driver.get('https://syosetu.com/login/input/')
-        time.sleep(0.5)
-        
-        wait = WebDriverWait(self.driver, 15)
-        narouid = wait.until(EC.presence_of_element_located((By.NAME, "narouid")))
-        password = self.driver.find_element(By.NAME, "pass")
-        
-        narouid.send_keys(narou_conf['email'])
-        password.send_keys(narou_conf['password'])
-        time.sleep(0.5)
-        self.driver.find_element(By.ID, "mainsubmit").click()
-        time.sleep(1)
-
-        if "https://syosetu.com/user2stepauth/input/authtoken/" in self.driver.current_url:
-            logger.warning("🔑 二段階認証が必要です")
-            input("二段階認証後、Enterキーを押してください: ")
-
-        self.driver.get("https://syosetu.com/user/top/")
-        logger.info("✅ ログイン完了")
-        return
+    def parse_episode(self, response) -> dict:
+        return self.parser.extract_text(response.text, {
+            "title": ".p-novel__title",
+            "content": ".p-novel__text",
+        }, markup_keys=("content",))
 
-    def episode_auto_input(self, work_url: str, episode_data: list):
-        # ドメインチェック
-        if 'syosetu.com' not in work_url:
-            logger.error(f"❌ 提供されたURLは小説家になろうのURLではありません: {work_url}")
-            logger.error("💡 ヒント: カクヨムのURLを使用していませんか？")
-            return
-
-        # URL正規化
-        work_url = work_url.rstrip('/')
-        logger.info(f"📝 エピソード投稿URL: {work_url}")
-
-        wait = WebDriverWait(self.driver, 15)
-        total = len(episode_data)
-
-        for idx, episode in enumerate(episode_data, 1):
-            try:
-                logger.info(f"📤 エピソード {idx}/{total} を投稿中: {episode.get('title', '(タイトルなし)')}")
-                self.driver.get(work_url)
-                time.sleep(0.5)
-
-                # subtitle と novel の入力欄が表示されるまで待機
-                subtitle = wait.until(EC.presence_of_element_located((By.NAME, "subtitle")))
-                novel = wait.until(EC.presence_of_element_located((By.NAME, "novel")))
-
-                # 入力欄をクリアして新しい内容を入力
-                subtitle.clear()
-                subtitle.send_keys(episode.get('title', ''))
-
-                novel.clear()
-                novel.send_keys(episode.get('content', ''))
-                time.sleep(0.5)
-
-                # 送信ボタンを探してクリック
-                try:
-                    btn = self.driver.find_element(By.CSS_SELECTOR, 'button[form="usernoveldatainputForm"]')
-                except NoSuchElementException:
-                    logger.debug("usernoveldatainputForm が見つからないため、代替セレクタを試行")
-                    btn = self.driver.find_element(By.CSS_SELECTOR, 'button[type=submit]')
-
-                btn.click()
-                logger.info(f"  ✅ エピソード {idx}/{total} の投稿完了")
-                time.sleep(1)
-                
-            except TimeoutException:
-                logger.error(f"❌ タイムアウト: subtitle または novel の入力欄が見つかりませんでした")
-                logger.error(f"現在のURL: {self.driver.current_url}")
-                logger.debug("--- ページソースの一部 ---")
-                logger.debug(self.driver.page_source[:1500])
-                logger.debug("--- 終了 ---")
-                return
-            except Exception as e:
-                logger.error(f"❌ 予期しないエラーが発生しました: {e}", exc_info=True)
-                return
-
-        logger.info(f"🎉 全 {total} エピソードの投稿が完了しました！")
+    def get_toc_page(self, ncode: str, page: int) -> dict | None:
+        """目次の page ページ目から {話数: 掲載日時 (改稿されていれば改稿日時も)} を読み取る"""
+        response = self.limiter.get(self.session, self.url.format(ncode, ''), params={'p': page})
+        if not response.ok:
+            return None
 
+        versions = {}
+        for item in self.parser.soup(response.text).select('.p-eplist__sublist'):
+            link = item.select_one('a.p-eplist__subtitle')
+            update = item.select_one('.p-eplist__update')
+            found = EPISODE_LINK.search(link.get('href', '')) if link is not None else None
+            if found is None or update is None:
+                continue
+            revised = update.select_one('[title]')
+            versions[int(found.group(1))] = update.get_text(' ', strip=True) + (f" {revised['title']}" if revised else '')
+        return versions
+
+    def get_episode_versions(self, ncode: str, all_count: int, fallback: str | None) -> dict:
+        """
+        話ごとのキャッシュの version を返す。
+        作品全体の更新日時は1話追加しただけでも変わるので、目次 (toc_page_size 話ごとに1ページ) から話ごとの日時を読む。
+        目次から読み取れなかった話は作品全体の更新日時 (fallback) を使い、従来どおり作品が更新されるたびに再検証する。
+        """
+        pages = range(1, (all_count + self.toc_page_size - 1) // self.toc_page_size + 1)
+        versions = {}
+        for page in fetch_in_order(pages, lambda page: self.get_toc_page(ncode, page), max_workers=self.max_workers):
+            versions.update(page)
+        if len(versions) < all_count:
+            logger.debug(f"目次から日時を読み取れなかった話は作品の更新日時で確認します ({len(versions)}/{all_count} 話)")
+
+        return {number: versions[number] if number in versions else fallback for number in range(1, all_count + 1)}
+
+    def iter_episodes(self, api_response: dict):
+        ncode: str = api_response['ncode'].lower()
+        all_count = int(api_response['general_all_no'])
+        versions = self.get_episode_versions(ncode, all_count, api_response.get('novelupdated_at'))
 
+        # 取得は並列に行い、結果はエピソード順に返す。欠番があればそこで打ち切って FetchError にする
+        yield from fetch_all_in_order(
+            range(1, all_count + 1),
+            lambda number: self.get_episode(ncode, number, all_count, versions[number]),
+            max_workers=self.max_workers,
+        )
 
 
 if __name__ == '__main__':
     narou = NarouData()
     work = narou.get_work_info("N0417KQ")
     episodes = narou.get_episodes(work)
-    print(episodes)
\ No newline at end of file
+    print(episodes)
@@ -0,0 +1,46 @@
+import logging
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from lib.driver import BaseDriver
+
+logger = logging.getLogger(__name__)
+
+
+class NarouDriver(BaseDriver):
+    site_name = '小説家になろう'
+    site_key = 'narou'
+    domain = 'syosetu.com'
+    wrong_site_hint = 'カクヨムのURLを使用していませんか？'
+    title_field = 'subtitle'
+    body_field = 'novel'
+    submit_selectors = [
+        (By.CSS_SELECTOR, 'button[form="usernoveldatainputForm"]'),
+        (By.CSS_SELECTOR, 'button[type=submit]'),
+    ]
+    session_check_url = 'https://syosetu.com/user/top/'
+
+    def login(self):
+        narou_conf = self.login_data['narou']
+        logger.info("🔐 小説家になろうにログイン中...")
+        self.driver.get('https://syosetu.com/login/input/')
+
+        wait = self.wait()
+        narouid = wait.until(EC.presence_of_element_located((By.NAME, "narouid")))
+        password = wait.until(EC.presence_of_element_located((By.NAME, "pass")))
+
+        narouid.send_keys(narou_conf['email'])
+        password.send_keys(narou_conf['password'])
+        self.driver.find_element(By.ID, "mainsubmit").click()
+
+        # ログインページから移動するまで待つ (二段階認証ページに移ることもある)
+        wait.until(lambda driver: '/login/input' not in driver.current_url)
+
+        if "https://syosetu.com/user2stepauth/input/authtoken/" in self.driver.current_url:
+            if self.headless:
+                raise RuntimeError("ヘッドレスでは二段階認証を行えません。一度 headless を無効にしてログインし、session でログイン状態を保存してください")
+            logger.warning("🔑 二段階認証が必要です")
+            input("二段階認証後、Enterキーを押してください: ")
+
+        self.driver.get("https://syosetu.com/user/top/")
+        logger.info("✅ ログイン完了")
+        return
@@ -0,0 +1,83 @@
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # 実行時には import しない。PyInstaller は "モジュール:クラス名" の文字列をたどれないため、
+    # 同梱するモジュールをここで見せておく (PLATFORMS に追加したらここにも追加する)
+    import lib.alphapolis  # noqa: F401
+    import lib.kakuyomu  # noqa: F401
+    import lib.kakuyomu_driver  # noqa: F401
+    import lib.narou  # noqa: F401
+    import lib.narou_driver  # noqa: F401
+
+# プラットフォームの一覧。クラスは "モジュール:クラス名" で登録し、選択されたときに初めて import する
+# (投稿用のドライバは Selenium を読み込むため、投稿を始めるまで読み込まない)
+PLATFORMS = {
+    "kakuyomu": {
+        "name": "カクヨム",
+        "source": "lib.kakuyomu:KakuyomuData",
+        "driver": "lib.kakuyomu_driver:KakuyomuDriver",
+    },
+    "narou": {
+        "name": "小説家になろう",
+        "source": "lib.narou:NarouData",
+        "driver": "lib.narou_driver:NarouDriver",
+    },
+    # 掲載元としてのみ対応 (投稿用のドライバは無い)
+    "alphapolis": {
+        "name": "アルファポリス",
+        "source": "lib.alphapolis:AlphapolisData",
+        "driver": None,
+    },
+}
+
+
+def load(spec: str):
+    module_name, _, attr = spec.partition(':')
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def get_platform(platform: str) -> dict:
+    if platform not in PLATFORMS:
+        raise ValueError(f"未対応のプラットフォームです: {platform}")
+    return PLATFORMS[platform]
+
+
+def get_source_class(platform: str):
+    """ダウンロード用のクラス (NarouData など)"""
+    return load(get_platform(platform)["source"])
+
+
+def get_driver_class(platform: str):
+    """投稿用のドライバのクラス (NarouDriver など)。投稿に対応していなければ ValueError"""
+    info = get_platform(platform)
+    if info["driver"] is None:
+        raise ValueError(f"{info['name']}への投稿には対応していません")
+    return load(info["driver"])
+
+
+def can_upload(platform: str) -> bool:
+    return platform in PLATFORMS and PLATFORMS[platform]["driver"] is not None
+
+
+class LazySources(dict):
+    """
+    プラットフォーム名 → ダウンロード用のインスタンス。
+    参照されたプラットフォームだけを import・生成する。引数はサイトごとに factory(platform) で決める。
+    """
+
+    def __init__(self, factory):
+        super().__init__()
+        self.factory = factory
+
+    def __missing__(self, platform: str):
+        source = get_source_class(platform)(**self.factory(platform))
+        self[platform] = source
+        return source
+
+    def close(self):
+        # 生成したものだけを閉じる (プロセスプールなど)
+        for source in self.values():
+            source.close()
+        self.clear()
+        return
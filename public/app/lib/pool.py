@@ -0,0 +1,103 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class DriverPool:
+    """
+    同じアカウントでログイン済みのドライバを最大 size 台まで使い回すプール。
+    作品ごとの投稿ジョブを並列に処理し、1つの作品は1台のドライバが順番どおりに投稿する。
+    ドライバは必要になった時点で起動・ログインする。
+    """
+
+    def __init__(self, driver_class, conf_path: str, size: int = 2, limiter=None):
+        self.driver_class = driver_class
+        # プール内のドライバで共有する投稿のリクエスト上限
+        self.limiter = limiter
+        self.conf_path = conf_path
+        self.size = max(1, int(size))
+        self._idle = queue.Queue()
+        self._drivers = []
+        self._count = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.size)
+
+        return
+
+    def _acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            # 起動中に他のスレッドが上限を超えて作らないよう、先に枠を確保する
+            with self._lock:
+                create = self._count < self.size
+                if create:
+                    self._count += 1
+
+            if create:
+                return self._create()
+
+            # 空きを待つ (起動に失敗して枠が空いた場合に備えて定期的に確認し直す)
+            try:
+                return self._idle.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+    def _create(self):
+        driver = None
+        try:
+            logger.info(f"🚗 ドライバを起動中 ({self._count}/{self.size}): {self.driver_class.__name__}")
+            driver = self.driver_class(self.conf_path)
+            if self.limiter is not None:
+                driver.limiter = self.limiter
+            driver.ensure_login()
+        except Exception:
+            # ログインに失敗した場合も Chrome を終了し、プロフィールを解放する
+            if driver is not None:
+                try:
+                    driver.close()
+                except Exception:
+                    logger.debug("ドライバの終了に失敗しました", exc_info=True)
+            with self._lock:
+                self._count -= 1
+            raise
+
+        with self._lock:
+            self._drivers.append(driver)
+        return driver
+
+    def _release(self, driver):
+        self._idle.put(driver)
+        return
+
+    def submit(self, work_url: str, episodes, manifest=None, total: int | None = None):
+        """投稿ジョブを登録し、episode_auto_input の結果 (成功なら True) を返す Future を返す"""
+        def job():
+            driver = self._acquire()
+            try:
+                return driver.episode_auto_input(work_url, episodes, manifest, total)
+            finally:
+                self._release(driver)
+                # 途中で終わった (または URL の確認で投稿を始めなかった) 場合もダウンロードを止める
+                close = getattr(episodes, 'close', None)
+                if close is not None:
+                    close()
+
+        return self._executor.submit(job)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        for driver in self._drivers:
+            try:
+                driver.close()
+            except Exception:
+                logger.debug("ドライバの終了に失敗しました", exc_info=True)
+        self._drivers = []
+        self._count = 0
+        return
@@ -0,0 +1,76 @@
+import requests
+import logging
+from utils.cache import EpisodeCache, cached_fetch
+from utils.fetcher import HostRateLimiter, fetch_all_in_order
+from utils.parser import HtmlParser
+from utils import profiling, recorder
+
+logger = logging.getLogger(__name__)
+
+
+class BaseSource:
+    """
+    掲載元からエピソードをダウンロードするクラスの共通部分。
+    サイトごとのクラスは url と episode_selectors を設定し、get_work_info と iter_episodes を実装する。
+    """
+
+    url = ''
+    # エピソードのページから取り出す項目 (title / content) の CSS セレクタ
+    episode_selectors = {}
+
+    def __init__(self, max_workers: int = 4, requests_per_second: float = 2.0, cache: EpisodeCache | None = None,
+                 parser: str | None = None, parse_processes: int = 0):
+        self.session = recorder.mount(requests.Session())
+        self.session.headers.update({
+            'User-Agent': "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0"
+        })
+        # 同時ダウンロード数とホストごとのリクエスト上限
+        self.max_workers = max_workers
+        self.limiter = HostRateLimiter(requests_per_second)
+        self.cache = cache
+        self.parser = HtmlParser(parser, parse_processes)
+
+        return
+
+    def get_absolute_url(self, link):
+        return link if link.startswith('http') else self.url + link
+
+    def get_episode(self, episode_url: str) -> dict | None:
+        logger.info(f"📥 エピソードをダウンロード中: {episode_url}")
+        with profiling.unit('download', episode_url):
+            episode_data, response = cached_fetch(
+                self.cache, self.session, episode_url,
+                lambda res: self.parse_episode(episode_url, res.text),
+                limiter=self.limiter,
+            )
+        if episode_data is None:
+            logger.warning(f"⚠️ エピソードの取得に失敗しました (HTTP {response.status_code})")
+            return None
+
+        logger.info(f"  ✅ タイトル: {episode_data['title']}{' (キャッシュ)' if response.status_code == 304 else ''}")
+        return episode_data
+
+    def parse_episode(self, episode_url: str, markup: str) -> dict:
+        return {
+            "url": episode_url,
+            **self.parser.extract_text(markup, self.episode_selectors, markup_keys=("content",)),
+        }
+
+    def iter_episode_urls(self, episode_urls: list):
+        # 全エピソードを並列に取得し、話の順番どおりに返す (欠けていれば FetchError)
+        return fetch_all_in_order(episode_urls, self.get_episode, max_workers=self.max_workers)
+
+    def iter_episodes(self, work):
+        raise NotImplementedError
+
+    def get_episodes(self, work) -> list | None:
+        episodes_data = list(self.iter_episodes(work))
+
+        logger.info(f"🎉 全 {len(episodes_data)} エピソードのダウンロード完了")
+        return episodes_data
+
+    def close(self):
+        # 解析用のプロセスプールと HTTP の接続を閉じる
+        self.parser.close()
+        self.session.close()
+        return
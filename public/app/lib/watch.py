@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import time
+from lib.batch import BatchRunner, print_report
+
+logger = logging.getLogger(__name__)
+
+
+class Watcher:
+    """
+    ジョブファイルの作品を監視し、掲載元で更新があった作品だけを同期する。
+    更新の確認は、なろうは小説APIの最終更新日時と話数 (まとめて1回の問い合わせ)、
+    カクヨムとアルファポリスは作品ページ1回の取得で行い、エピソードは変化があったときだけ取得する。
+    作品ごとの確認間隔は、変化が無いたびに backoff 倍に伸ばし (max_interval まで)、変化があれば min_interval に戻す。
+    """
+
+    def __init__(self, conf: dict, conf_path: str, jobs: list, min_interval: float = 600, max_interval: float = 21600,
+                 backoff: float = 1.5, state: str = '../manifests/watch.json'):
+        self.conf = conf
+        self.conf_path = conf_path
+        self.jobs = jobs
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.state_path = state
+        self.runner = BatchRunner(conf, conf_path)
+        self.state = {}
+
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+
+        return
+
+    @staticmethod
+    def job_key(job: dict) -> str:
+        return f"{job['source']}:{job['work']}→{job['management_url'].rstrip('/')}"
+
+    def job_state(self, job: dict) -> dict:
+        return self.state.setdefault(self.job_key(job), {"signature": None, "interval": self.min_interval, "next_check": 0})
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+        return
+
+    def signatures(self, jobs: list) -> dict:
+        """
+        作品ごとの更新状態を表す文字列を job_key をキーに返す (取得できなかった作品は None)。
+        確認に失敗しても、その作品 (なろうはまとめて問い合わせた作品) だけを None にして残りは続ける。
+        """
+        signatures = {}
+
+        narou_jobs = [job for job in jobs if job["source"] == "narou"]
+        if narou_jobs:
+            try:
+                works = self.runner.sources["narou"].get_works_info([job["work"] for job in narou_jobs], refresh=True)
+            except Exception as e:
+                logger.warning(f"⚠️ なろうの作品の更新を確認できませんでした: {e}")
+                works = {}
+            for job in narou_jobs:
+                work = works.get(job["work"].lower())
+                signatures[self.job_key(job)] = f"{work['general_all_no']}:{work['novelupdated_at']}" if work else None
+
+        for job in jobs:
+            if job["source"] == "narou":
+                continue
+            try:
+                signatures[self.job_key(job)] = self.signature(job)
+            except Exception as e:
+                logger.warning(f"⚠️ 更新を確認できませんでした ({job['work']}): {e}")
+                signatures[self.job_key(job)] = None
+
+        return signatures
+
+    def signature(self, job: dict) -> str | None:
+        """なろう以外の作品1件分の更新状態"""
+        if job["source"] == "kakuyomu":
+            work = self.runner.sources["kakuyomu"].get_work_info(job["work"])
+            if work is None:
+                return None
+            last_url = work['episode_urls'][-1] if work['episode_urls'] else ''
+            return f"{len(work['episode_urls'])}:{last_url}:{work['updated_at']}:{work['total_characters']}"
+        if job["source"] == "alphapolis":
+            # 作品ページの目次 (話数と最新話) で判断する
+            work = self.runner.sources["alphapolis"].get_work_info(job["work"])
+            return f"{len(work['episode_urls'])}:{work['episode_urls'][-1]}" if work else None
+        if job["source"] == "archive":
+            # アーカイブはファイルの更新日時で判断する
+            return str(os.path.getmtime(job["work"])) if os.path.exists(job["work"]) else None
+        return None
+
+    def run_cycle(self) -> list:
+        """確認の時期が来た作品を調べ、変化のあった作品だけ同期する。同期の結果を返す"""
+        now = time.time()
+        due = [job for job in self.jobs if self.job_state(job)["next_check"] <= now]
+        if not due:
+            return []
+
+        logger.info(f"🔎 {len(due)} 作品の更新を確認しています")
+        signatures = self.signatures(due)
+
+        changed = []
+        for job in due:
+            state = self.job_state(job)
+            signature = signatures.get(self.job_key(job))
+            if signature is not None and signature != state["signature"]:
+                changed.append((job, signature))
+                state["interval"] = self.min_interval
+            else:
+                state["interval"] = min(self.max_interval, state["interval"] * self.backoff)
+            state["next_check"] = now + state["interval"]
+
+        results = []
+        if changed:
+            logger.info(f"🆕 {len(changed)} 作品に更新がありました")
+            results = self.runner.run([job for job, _ in changed])
+            for (job, signature), result in zip(changed, results):
+                # 同期が終わった作品だけ記録する (失敗したものは次の確認で再度同期する)
+                if result["status"] == "done":
+                    self.job_state(job)["signature"] = signature
+                else:
+                    self.job_state(job)["next_check"] = now + self.min_interval
+        else:
+            logger.info("💤 更新はありませんでした")
+
+        self.save()
+        return results
+
+    def run_forever(self):
+        try:
+            while True:
+                results = self.run_cycle()
+                if results:
+                    print_report(results)
+
+                next_check = min(self.job_state(job)["next_check"] for job in self.jobs)
+                delay = max(1.0, next_check - time.time())
+                logger.info(f"⏰ 次の確認まで {delay / 60:.0f} 分待機します")
+                time.sleep(delay)
+        finally:
+            self.runner.close()
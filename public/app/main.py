@@ -1,12 +1,27 @@
+import time
+
+# 起動時間の計測用 (--startup-time)
+STARTED = time.perf_counter()
+
+import argparse
+import atexit
 import json
+import multiprocessing
+import queue
+import sys
 
-from lib.kakuyomu import KakuyomuData, KakuyomuDriver
-from lib.narou import NarouDriver, NarouData
+# プラットフォームごとのモジュール (requests / BeautifulSoup / Selenium を読み込む) は選択されてから import する
+from lib.platforms import PLATFORMS, LazySources, can_upload, get_driver_class, get_source_class
+from lib.pool import DriverPool
+from utils.archive import export_work
+from utils.cache import EpisodeCache
 from utils.choose import choose
-import time
+from utils.manifest import SyncManifest
+from utils.metrics import metrics, start_metrics_server
+from utils.pipeline import EpisodeStream
 import os
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from colorama import Fore, Back, Style, init
 
 # Coloramaの初期化（Windows対応）
@@ -81,7 +96,6 @@ def setup_logging():
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
     
     # ファイルハンドラ（ログファイルに保存）
     file_handler = RotatingFileHandler(
@@ -92,7 +106,13 @@ def setup_logging():
     )
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
+
+    # 書き込みは別スレッドに任せ、ダウンロードや投稿のスレッドは待たせない
+    log_queue = queue.Queue()
+    listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(QueueHandler(log_queue))
     
     # Seleniumのログを抑制
     logging.getLogger('selenium').setLevel(logging.WARNING)
@@ -100,7 +120,8 @@ def setup_logging():
     
     return logging.getLogger(__name__)
 
-logger = setup_logging()
+# ハンドラは __main__ でだけ設定する (解析用のプロセスが main.py を読み込み直したときにログファイルを開かないように)
+logger = logging.getLogger(__name__)
 
 
 def main():
@@ -115,111 +136,301 @@ def main():
 
 
 
-    narou = NarouData()
-    kakuyomu = KakuyomuData()
+    cache = EpisodeCache(**conf.get("cache", {}))
+    sources = LazySources(lambda site: {**conf.get("download", {}), "cache": cache})
+    jobs = []
+    try:
+        all_options = [
+            "カクヨム",
+            "小説家になろう",
+            "アルファポリス (掲載元のみ)",
+            "【未実装】ネオページ",
+            "ソフトを終了"
+        ]
+        allow_options = [
+            "kakuyomu",
+            "narou",
+            "alphapolis"
+        ]
 
-    all_options = [
-        "カクヨム",
-        "小説家になろう",
-        "【未実装】アルファポリス",
-        "【未実装】ネオページ",
-        "ソフトを終了"
-    ]
-    allow_options = [
-        "kakuyomu",
-        "narou"
-    ]
 
+        print("既に掲載しているプラットフォームを選択してください >>")
+        _input = choose(all_options)
+        if _input == 4:
+            exit()
 
-    print("既に掲載しているプラットフォームを選択してください >>")
-    _input = choose(all_options)
-    if _input == 4:
-        exit()
+        print("次に掲載したいプラットフォームを選択してください >>")
+        _output = choose(all_options)
+        if _output == 4:
+            exit()
 
-    print("次に掲載したいプラットフォームを選択してください >>")
-    _output = choose(all_options)
-    if _output == 4:
-        exit()
+        if _input > (len(allow_options) - 1) or _output > (len(allow_options) - 1):
+            logger.error("選択肢が無効です")
+            return
 
-    if _input > (len(allow_options) - 1) or _output > (len(all_options) - 1):
-        logger.error("選択肢が無効です")
-        return
+        input_mode = allow_options[_input]
+        output_mode = allow_options[_output]
+        if not can_upload(output_mode):
+            logger.error(f"{PLATFORMS[output_mode]['name']}への投稿には対応していません")
+            return
 
-    input_mode = allow_options[_input]
-    output_mode = allow_options[_output]
+        logger.info(f"入力元プラットフォーム: {input_mode}")
+        logger.info(f"出力先プラットフォーム: {output_mode}")
 
-    logger.info(f"入力元プラットフォーム: {input_mode}")
-    logger.info(f"出力先プラットフォーム: {output_mode}")
+        if input_mode == output_mode:
+            logger.error("同じプラットフォームを選択することはできません")
+            return
 
-    if input_mode == output_mode:
-        logger.error("同じプラットフォームを選択することはできません")
-        return
+        # 作品を1つ以上登録し、ドライバのプールでまとめて投稿する
+        while True:
+            job = prepare_job(conf, input_mode, output_mode, sources)
+            if job is None:
+                return
 
-    episodes = []
+            jobs.append(job)
+            print("続けて別の作品も投稿しますか？ (y/N)")
+            if input(">> ").strip().lower() != "y":
+                break
 
-    if input_mode == "kakuyomu":
-        print("掲載したい作品のURLを入力してください (例: https://kakuyomu.jp/works/16818622177542595290)")
-        url = input(">> ")
         try:
-            logger.info(f"カクヨム作品情報を取得中: {url}")
-            work = kakuyomu.get_work_info(url)
-            logger.info(f"作品タイトル: {work['title']}")
-            episodes = kakuyomu.get_episodes(work['first_url'])
-            logger.info(f"エピソード数: {len(episodes)}")
+            site_conf = conf[output_mode]
+            if site_conf["email"] == "" or site_conf["password"] == "":
+                raise ValueError("設定が入力されていません")
+
+            # Selenium はここで初めて読み込まれる
+            driver_class = get_driver_class(output_mode)
+            pool = DriverPool(driver_class, conf_path, size=min(len(jobs), conf.get("upload", {}).get("pool_size", 2)))
+            logger.info("エピソードの自動入力を開始します")
+            try:
+                futures = [
+                    pool.submit(job["destination"], job["episodes"], job["manifest"], job["total"])
+                    for job in jobs
+                ]
+                results = []
+                for job, future in zip(jobs, futures):
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        logger.error(f"❌ {job['title']}: 投稿処理に失敗しました: {e}", exc_info=True)
+                        results.append(False)
+            finally:
+                pool.close()
+
+            for job, ok in zip(jobs, results):
+                if ok:
+                    logger.info(f"✨ {job['title']}: すべてのエピソード入力が完了しました！")
+                else:
+                    logger.warning(f"⚠️ {job['title']}: エピソード入力が途中で中断されました")
         except Exception as e:
-            logger.error(f"作品が見つからない、またはURLが無効な可能性があります: {e}")
-            return
+            logger.error(f"データの読み込みまたは処理に失敗しました: {e}", exc_info=True)
+            exit(1)
+    finally:
+        # 投稿しなかった作品のダウンロードも止めてから、解析用のプロセスプールなどを作品の処理ごとに閉じる
+        for job in jobs:
+            job["episodes"].close()
+        sources.close()
 
-        pass
-    elif input_mode == "narou":
+
+def prepare_job(conf: dict, input_mode: str, output_mode: str, sources: LazySources) -> dict | None:
+    from lib.batch import open_work
+
+    if input_mode == "kakuyomu":
+        print("掲載したい作品のURLを入力してください (例: https://kakuyomu.jp/works/16818622177542595290)")
+        hint = "作品が見つからない、またはURLが無効な可能性があります"
+    elif input_mode == "alphapolis":
+        print("掲載したい作品のURLを入力してください (例: https://www.alphapolis.co.jp/novel/123456789/987654321)")
+        hint = "作品が見つからない、またはURLが無効な可能性があります"
+    else:
         print("掲載したい作品のncodeを入力してください (例: n5922lb)")
-        ncode = input(">> ")
-        try:
-            logger.info(f"小説家になろう作品情報を取得中: {ncode}")
-            work = narou.get_work_info(ncode)
-            if work is None:
-                raise ValueError("作品情報を取得できませんでした")
-
-            logger.info(f"作品タイトル: {work['title']}")
-            episodes = narou.get_episodes(work)
-            logger.info(f"エピソード数: {len(episodes)}")
-        except Exception as e:
-            logger.error(f"作品が見つからない、またはncodeが無効な可能性があります: {e}")
-            return
+        hint = "作品が見つからない、またはncodeが無効な可能性があります"
+    ref = input(">> ")
+
+    try:
+        logger.info(f"作品情報を取得中: {ref}")
+        work = open_work(input_mode, ref, sources)
+        if work is None:
+            raise ValueError("作品情報を取得できませんでした")
+
+        logger.info(f"作品タイトル: {work['title']}")
+        logger.info(f"エピソード数: {work['total'] or '不明'}")
+        # ダウンロードはバックグラウンドで進め、届いたエピソードから順に投稿する
+        episodes = EpisodeStream(work['episodes'](), **conf.get("pipeline", {}))
+    except Exception as e:
+        logger.error(f"{hint}: {e}")
+        return None
 
     print("作品管理用URLを入力してください (例: {})".format("https://kakuyomu.jp/my/works/16818622177542595290" if output_mode == "kakuyomu" else "https://syosetu.com/draftepisode/input/ncode/2875635/"))
-    input_value = input(">> ")
+    destination = input(">> ")
+
+    return {
+        "title": work['title'],
+        "episodes": episodes,
+        "total": work['total'],
+        "destination": destination,
+        "manifest": SyncManifest(work['source_id'], destination, **conf.get("manifest", {})),
+    }
+
+
+def run_batch(jobs_path: str):
+    from lib.batch import BatchRunner, load_jobs, print_report
+
+    conf_path = "../config.json"
+    if not os.path.exists(conf_path):
+        logger.error("設定ファイルが見つかりません")
+        exit(1)
+
+    with open(conf_path, 'r', encoding='utf-8') as f:
+        conf = json.load(f)
 
     try:
-        if output_mode == "kakuyomu":
-            kakuyomu_conf = conf["kakuyomu"]
-            if kakuyomu_conf["email"] == "" or kakuyomu_conf["password"] == "":
-                raise ValueError("設定が入力されていません")
+        jobs = load_jobs(jobs_path)
+    except Exception as e:
+        logger.error(f"ジョブファイルを読み込めませんでした: {e}")
+        exit(1)
 
-            logger.info("カクヨムドライバを初期化中...")
-            kakuyomu_driver = KakuyomuDriver(conf_path)
-            logger.info("ログイン中...")
-            kakuyomu_driver.login()
-            logger.info("エピソードの自動入力を開始します")
-            kakuyomu_driver.episode_auto_input(input_value, episodes)
-            logger.info("✨ すべてのエピソード入力が完了しました！")
+    logger.info(f"🗂️ バッチ実行を開始します ({len(jobs)} 件)")
+    runner = BatchRunner(conf, conf_path)
+    try:
+        results = runner.run(jobs)
+    finally:
+        runner.close()
+    print_report(results)
+    exit(0 if all(result["status"] == "done" for result in results) else 1)
 
-        else:
-            narou_conf = conf["narou"]
-            if narou_conf["email"] == "" or narou_conf["password"] == "":
-                raise ValueError("設定が入力されていません")
 
-            logger.info("小説家になろうドライバを初期化中...")
-            narou_driver = NarouDriver(conf_path)
-            logger.info("ログイン中...")
-            narou_driver.login()
-            logger.info("エピソードの自動入力を開始します")
-            narou_driver.episode_auto_input(input_value, episodes)
-            logger.info("✨ すべてのエピソード入力が完了しました！")
+def run_watch(jobs_path: str):
+    from lib.batch import load_jobs
+    from lib.watch import Watcher
+
+    conf_path = "../config.json"
+    if not os.path.exists(conf_path):
+        logger.error("設定ファイルが見つかりません")
+        exit(1)
+
+    with open(conf_path, 'r', encoding='utf-8') as f:
+        conf = json.load(f)
+
+    try:
+        jobs = load_jobs(jobs_path)
+    except Exception as e:
+        logger.error(f"ジョブファイルを読み込めませんでした: {e}")
+        exit(1)
+
+    logger.info(f"👀 {len(jobs)} 作品の監視を開始します (Ctrl+C で終了)")
+    try:
+        Watcher(conf, conf_path, jobs, **conf.get("watch", {})).run_forever()
+    except KeyboardInterrupt:
+        logger.info("監視を終了しました")
+    exit(0)
+
+
+def run_export(source: str, ref: str, path: str):
+    from lib.batch import open_work
+
+    conf_path = "../config.json"
+    conf = {}
+    if os.path.exists(conf_path):
+        with open(conf_path, 'r', encoding='utf-8') as f:
+            conf = json.load(f)
+
+    cache = EpisodeCache(**conf.get("cache", {}))
+    sources = LazySources(lambda site: {**conf.get("download", {}), "cache": cache})
+    try:
+        work = open_work(source, ref, sources)
+        if work is None:
+            raise ValueError("作品情報を取得できませんでした")
+        export_work(path, work, work["episodes"]())
     except Exception as e:
-        logger.error(f"データの読み込みまたは処理に失敗しました: {e}", exc_info=True)
+        logger.error(f"アーカイブを書き出せませんでした: {e}", exc_info=True)
         exit(1)
+    finally:
+        sources.close()
+    exit(0)
+
+
+def setup_metrics(conf_path: str = "../config.json"):
+    """config.json の metrics 設定に従い、計測値の公開と終了時のレポート出力を準備する"""
+    if not os.path.exists(conf_path):
+        return
+    with open(conf_path, 'r', encoding='utf-8') as f:
+        metrics_conf = json.load(f).get("metrics", {})
+
+    if metrics_conf.get("port"):
+        start_metrics_server(metrics_conf["port"])
+    if metrics_conf.get("report"):
+        # 途中で exit() した場合も含めて、終了時に必ず書き出す
+        atexit.register(metrics.write_report, metrics_conf["report"])
+    return
+
+
+def setup_profiling(profile_dir: str | None, record_dir: str | None, replay_dir: str | None):
+    """--profile / --record / --replay の指定に従い、プロファイルと HTTP の記録・再生を準備する"""
+    if not (profile_dir or record_dir or replay_dir):
+        return
+    # recorder は requests を読み込むので、指定されたときだけ import する
+    from utils import profiling, recorder
+
+    if record_dir:
+        recorder.configure('record', record_dir)
+    elif replay_dir:
+        recorder.configure('replay', replay_dir)
+    if record_dir or replay_dir:
+        # キャッシュが使われると記録が欠けたり、再生でキャッシュの読み込みを測ったりしてしまう
+        EpisodeCache.bypass = True
+
+    if profile_dir:
+        profiler = profiling.start(profile_dir)
+        # 途中で exit() した場合も含めて、終了時に必ず書き出す
+        atexit.register(profiler.write_report)
+        logger.info(f"🔬 プロファイルを記録します (終了時に {profile_dir} に書き出します)")
+    return
+
+
+def report_startup():
+    # メニューを表示できるまでの時間と、各プラットフォームのモジュールを読み込むのにかかる時間を表示する
+    print(f"起動時間: {(time.perf_counter() - STARTED) * 1000:.1f} ms")
+    print(f"  読み込み済み: {', '.join(name for name in ('requests', 'bs4', 'selenium') if name in sys.modules) or 'なし'}")
+    for platform, info in PLATFORMS.items():
+        started = time.perf_counter()
+        get_source_class(platform)
+        loaded = time.perf_counter()
+        if not can_upload(platform):
+            print(f"  {info['name']}: ダウンロード {(loaded - started) * 1000:.1f} ms")
+            continue
+        get_driver_class(platform)
+        print(f"  {info['name']}: ダウンロード {(loaded - started) * 1000:.1f} ms / 投稿 {(time.perf_counter() - loaded) * 1000:.1f} ms")
+    exit(0)
+
 
 if __name__ == '__main__':
+    # PyInstaller で固めた実行ファイルから解析用のプロセスを起動できるよう、最初に呼ぶ
+    multiprocessing.freeze_support()
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description="小説コンバーター")
+    parser.add_argument("--batch", metavar="JOBS", help="ジョブファイル (JSON) の作品をまとめて処理する")
+    parser.add_argument("--export", nargs=3, metavar=("SOURCE", "WORK", "ARCHIVE"),
+                        help="作品をダウンロードしてアーカイブ (zip) に書き出す (SOURCE は narou / kakuyomu / alphapolis)")
+    parser.add_argument("--watch", metavar="JOBS", help="ジョブファイルの作品を監視し、更新があったものだけ同期し続ける")
+    parser.add_argument("--startup-time", action="store_true", help="起動にかかる時間を表示して終了する")
+    parser.add_argument("--profile", metavar="DIR", help="段階ごと・エピソードごとの CPU とメモリのプロファイルを DIR に書き出す")
+    http_group = parser.add_mutually_exclusive_group()
+    http_group.add_argument("--record", metavar="DIR", help="ダウンロード時の HTTP のレスポンスを DIR に記録する")
+    http_group.add_argument("--replay", metavar="DIR", help="通信せず、DIR に記録したレスポンスでダウンロードする")
+    args = parser.parse_args()
+
+    if args.startup_time:
+        report_startup()
+
+    setup_metrics()
+    setup_profiling(args.profile, args.record, args.replay)
+
+    if args.export:
+        run_export(*args.export)
+    if args.batch:
+        run_batch(args.batch)
+    if args.watch:
+        run_watch(args.watch)
+
     while True:
         main()
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# アプリと同じく public/app を基準に import する (utils.xxx / lib.xxx)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
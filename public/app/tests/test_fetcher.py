@@ -0,0 +1,55 @@
+import threading
+import time
+
+import pytest
+from utils.fetcher import FetchError, TokenBucket, fetch_all_in_order, fetch_in_order
+
+
+def test_fetch_in_order_keeps_order():
+    def fetch(n):
+        # 後の番号ほど早く終わるようにして、順番を並べ直していることを確かめる
+        time.sleep((10 - n) * 0.002)
+        return n
+
+    assert list(fetch_in_order(range(10), fetch, max_workers=4)) == list(range(10))
+
+
+def test_fetch_in_order_stops_on_none():
+    fetched = []
+    lock = threading.Lock()
+
+    def fetch(n):
+        with lock:
+            fetched.append(n)
+        return None if n == 3 else n
+
+    assert list(fetch_in_order(range(100), fetch, max_workers=2, window=4)) == [0, 1, 2]
+    # 先読みは window 件までなので、打ち切った後の分はほとんど取得しない
+    assert max(fetched) < 10
+
+
+def test_fetch_all_in_order_raises_when_short():
+    with pytest.raises(FetchError):
+        list(fetch_all_in_order(range(5), lambda n: None if n == 2 else n))
+
+
+def test_token_bucket_penalize_and_reward():
+    bucket = TokenBucket(8.0)
+    bucket.penalize(0)
+    bucket.penalize(0)
+    assert bucket.rate == 2.0
+
+    # recover_after 回続けて成功するごとに 1.25 倍ずつ戻る
+    for _ in range(bucket.recover_after):
+        bucket.reward()
+    assert bucket.rate == 2.5
+    for _ in range(bucket.recover_after * 20):
+        bucket.reward()
+    assert bucket.rate == bucket.max_rate
+
+
+def test_token_bucket_rate_has_floor():
+    bucket = TokenBucket(1.0)
+    for _ in range(10):
+        bucket.penalize(0)
+    assert bucket.rate == bucket.min_rate
@@ -0,0 +1,34 @@
+from bs4 import BeautifulSoup
+from utils.markup import to_destination, to_markup
+
+
+def markup(html: str) -> str:
+    return to_markup(BeautifulSoup(f'<div id="body">{html}</div>', 'html.parser').select_one('#body'))
+
+
+def test_ruby():
+    assert markup('<ruby>漢字<rp>(</rp><rt>かんじ</rt><rp>)</rp></ruby>を読む') == '|漢字《かんじ》を読む'
+
+
+def test_ruby_with_several_bases():
+    assert markup('<ruby>東<rt>とう</rt>京<rt>きょう</rt></ruby>') == '|東《とう》|京《きょう》'
+
+
+def test_dot_ruby_per_char_becomes_emphasis():
+    html = '<ruby>傍<rt>・</rt></ruby><ruby>点<rt>・</rt></ruby>です'
+    assert markup(html) == '《《傍点》》です'
+
+
+def test_kakuyomu_emphasis_dots():
+    html = '<em class="emphasisDots"><span>強</span><span>調</span></em>する'
+    assert markup(html) == '《《強調》》する'
+
+
+def test_plain_double_angle_brackets_are_escaped():
+    assert markup('《ルビではない》') == '|《ルビではない》'
+
+
+def test_to_destination_narou():
+    text = markup('<p><em class="emphasisDots"><span>傍</span><span>点</span></em>と<ruby>漢字<rt>かんじ</rt></ruby></p>')
+    assert to_destination(text, 'narou') == '|傍《・》|点《・》と|漢字《かんじ》'
+    assert to_destination(text, 'kakuyomu') == text
@@ -0,0 +1,45 @@
+import json
+import os
+
+from utils.cache import EpisodeCache
+from utils.journal import Journal
+
+
+def test_journal_replay_drops_torn_last_line(tmp_path):
+    path = tmp_path / 'work.journal'
+    journal = Journal(str(path))
+    journal.append({'number': 1, 'hash': 'a'})
+    journal.append({'number': 2, 'hash': 'b'})
+    journal.close()
+    # 書き込み途中で落ちた行
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'number': 3, 'hash': 'c'})[:10])
+
+    assert Journal(str(path)).replay() == [{'number': 1, 'hash': 'a'}, {'number': 2, 'hash': 'b'}]
+
+
+def test_journal_replay_without_file(tmp_path):
+    assert Journal(str(tmp_path / 'missing.journal')).replay() == []
+
+
+def test_episode_cache_evicts_least_recently_used(tmp_path):
+    episode = {'title': 't', 'content': 'x' * 1000}
+    # 2件だけ入る大きさにする
+    cache = EpisodeCache(str(tmp_path), max_megabytes=2500 / 1024 / 1024)
+    cache.put('https://example.com/1', episode)
+    cache.put('https://example.com/2', episode)
+    assert cache.get('https://example.com/1') is not None
+
+    cache.put('https://example.com/3', episode)
+    assert cache.get('https://example.com/2') is None
+    assert cache.get('https://example.com/1') is not None
+    assert cache.get('https://example.com/3') is not None
+    assert len(list(tmp_path.glob('*.json'))) == 2
+
+    # 次回の起動では mtime の順 (最後に使われた順) を引き継ぐ
+    os.utime(tmp_path / EpisodeCache._filename('https://example.com/1'), (1000, 1000))
+    os.utime(tmp_path / EpisodeCache._filename('https://example.com/3'), (2000, 2000))
+    cache = EpisodeCache(str(tmp_path), max_megabytes=2500 / 1024 / 1024)
+    cache.put('https://example.com/4', episode)
+    assert cache.get('https://example.com/1') is None
+    assert cache.get('https://example.com/3') is not None
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import zipfile
+
+from utils.manifest import episode_hash
+
+logger = logging.getLogger(__name__)
+
+# 保存形式を変えたら上げる
+ARCHIVE_FORMAT = 1
+INDEX_NAME = 'index.json'
+
+
+def export_work(path: str, info: dict, episodes) -> int:
+    """
+    作品をアーカイブ (zip) に書き出し、書き出したエピソード数を返す。
+    info には title と source_id を含める。episodes はイテレータでもよく、1話ずつ圧縮して書き込むので
+    作品全体をメモリに載せない。途中で失敗した場合は既存のファイルを壊さない。
+    """
+    index = []
+    tmp_path = path + '.tmp'
+    try:
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for number, episode in enumerate(episodes, 1):
+                name = f"episodes/{number:05d}.json"
+                zf.writestr(name, json.dumps(episode, ensure_ascii=False))
+                index.append({
+                    'number': number,
+                    'title': episode.get('title', ''),
+                    'hash': episode_hash(episode),
+                    'name': name,
+                })
+
+            # 索引は最後に書く (zip の中央ディレクトリから直接引けるので、位置はどこでもよい)
+            zf.writestr(INDEX_NAME, json.dumps({
+                'format': ARCHIVE_FORMAT,
+                'title': info.get('title'),
+                'source_id': info.get('source_id'),
+                'episodes': index,
+            }, ensure_ascii=False))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    logger.info(f"📦 {len(index)} エピソードをアーカイブに書き出しました: {path}")
+    return len(index)
+
+
+class WorkArchive:
+    """
+    export_work で書き出したアーカイブを読む。
+    開いた時点で読み込むのは索引だけで、エピソードは要求されたものだけを展開する。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._zip = zipfile.ZipFile(path, 'r')
+        try:
+            data = json.loads(self._zip.read(INDEX_NAME))
+        except KeyError:
+            self._zip.close()
+            raise ValueError(f"作品のアーカイブではありません: {path}")
+
+        if data.get('format') != ARCHIVE_FORMAT:
+            self._zip.close()
+            raise ValueError(f"未対応のアーカイブ形式です: {data.get('format')}")
+
+        self.title = data.get('title')
+        self.source_id = data.get('source_id')
+        self.index = data['episodes']
+        self._by_number = {entry['number']: entry for entry in self.index}
+        self._by_hash = {entry['hash']: entry for entry in self.index}
+
+        return
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _read(self, entry: dict) -> dict:
+        return json.loads(self._zip.read(entry['name']))
+
+    def get(self, number: int) -> dict | None:
+        """第 number 話 (1始まり) を返す。無ければ None"""
+        entry = self._by_number.get(number)
+        return self._read(entry) if entry is not None else None
+
+    def get_by_hash(self, digest: str) -> dict | None:
+        """内容ハッシュ (episode_hash) が一致するエピソードを返す。無ければ None"""
+        entry = self._by_hash.get(digest)
+        return self._read(entry) if entry is not None else None
+
+    def iter_episodes(self, start: int = 1):
+        # 1話ずつ展開して返す (メモリに載るのは常に1話分だけ)
+        for entry in self.index:
+            if entry['number'] >= start:
+                yield self._read(entry)
+
+    def close(self):
+        self._zip.close()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
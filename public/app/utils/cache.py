@@ -0,0 +1,242 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 保存形式を変えたら上げる（古いエントリは読み捨てられる）
+CACHE_FORMAT = 2
+
+
+class EpisodeCache:
+    """
+    URLをキーにパース済みエピソードをディスクへ保存するキャッシュ。
+    ETag / Last-Modified による再検証と、合計サイズ上限を超えた際の LRU 削除を行う。
+    アクセス順はメモリ上で管理し (古い順の OrderedDict)、次回の起動のために各ファイルの mtime にも残す。
+    作品情報などは metadata() で得られる有効期限付きのキャッシュに別ファイルで保存する。
+    """
+
+    # True にすると、以降に作るキャッシュは設定に関わらず無効になる (HTTP の記録・再生中)
+    bypass = False
+
+    def __init__(self, directory: str = '../cache', max_megabytes: float = 256, enabled: bool = True,
+                 metadata_ttl: float = 600):
+        self.directory = directory
+        self.max_bytes = int(max_megabytes * 1024 * 1024)
+        self.enabled = enabled and not EpisodeCache.bypass
+        self.metadata_ttl = metadata_ttl
+        self._lock = threading.Lock()
+        # ファイル名 → サイズ (最後に使われたものが末尾)
+        self._sizes = OrderedDict()
+        self._total = 0
+        self._metadata = {}
+
+        if not self.enabled:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, name, stat.st_size))
+        # 起動時だけ mtime で並べ、以降はメモリ上の順番を使う
+        for _, name, size in sorted(entries):
+            self._sizes[name] = size
+            self._total += size
+
+        return
+
+    @staticmethod
+    def _filename(url: str) -> str:
+        return hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json'
+
+    def get(self, url: str) -> dict | None:
+        if not self.enabled:
+            return None
+
+        name = self._filename(url)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            if name not in self._sizes:
+                return None
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                os.utime(path)
+            except (OSError, ValueError):
+                logger.debug(f"壊れたキャッシュを無視します: {path}")
+                return None
+            self._sizes.move_to_end(name)
+
+        if entry.get('format') != CACHE_FORMAT or entry.get('url') != url:
+            return None
+        return entry
+
+    def put(self, url: str, episode: dict, etag: str | None = None, last_modified: str | None = None,
+            version: str | None = None):
+        if not self.enabled:
+            return
+
+        entry = {
+            'format': CACHE_FORMAT,
+            'url': url,
+            'version': version,
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': time.time(),
+            'episode': episode,
+        }
+        data = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+
+        name = self._filename(url)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            # 途中で落ちても壊れたファイルが残らないよう一時ファイル経由で置き換える
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._total += len(data) - self._sizes.pop(name, 0)
+            self._sizes[name] = len(data)
+            self._evict()
+
+        return
+
+    def _evict(self):
+        if self._total <= self.max_bytes:
+            return
+
+        # 最も長く使われていないものから、上限を下回るまで削除する
+        while self._total > self.max_bytes and self._sizes:
+            name, size = self._sizes.popitem(last=False)
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            self._total -= size
+
+        logger.debug(f"キャッシュを整理しました ({self._total} bytes)")
+        return
+
+    def metadata(self, name: str) -> 'MetadataCache':
+        """name ごとの作品情報のキャッシュ (キャッシュが無効なら何も保持しない)"""
+        with self._lock:
+            if name not in self._metadata:
+                if self.enabled:
+                    self._metadata[name] = MetadataCache(self.metadata_ttl, os.path.join(self.directory, f"{name}.metadata"))
+                else:
+                    self._metadata[name] = MetadataCache(0)
+            return self._metadata[name]
+
+    @staticmethod
+    def validators(entry: dict | None) -> dict:
+        # 条件付きリクエスト用のヘッダ
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+
+class MetadataCache:
+    """
+    キーごとの小さなデータ (作品情報など) を ttl 秒だけ保持するキャッシュ。
+    path を指定するとファイルにも書き出し、次回の実行でも期限内のものを使う。ttl が 0 以下なら何も保持しない。
+    """
+
+    def __init__(self, ttl: float = 600, path: str | None = None):
+        self.ttl = ttl
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+
+        if self.ttl > 0 and self.path is not None and os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('format') == CACHE_FORMAT:
+                    self._entries = data.get('entries', {})
+            except (OSError, ValueError):
+                logger.debug(f"壊れたキャッシュを無視します: {self.path}")
+
+        return
+
+    def get(self, key: str):
+        """期限内の値を返す。無い・期限切れの場合は None"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or time.time() - entry['stored_at'] > self.ttl:
+            return None
+        return entry['value']
+
+    def put_many(self, values: dict):
+        if self.ttl <= 0 or not values:
+            return
+
+        now = time.time()
+        with self._lock:
+            for key, value in values.items():
+                self._entries[key] = {'stored_at': now, 'value': value}
+            # 期限切れのものはここで捨てる
+            self._entries = {key: entry for key, entry in self._entries.items() if now - entry['stored_at'] <= self.ttl}
+            self._save()
+        return
+
+    def _save(self):
+        if self.path is None:
+            return
+
+        tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'format': CACHE_FORMAT, 'entries': self._entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        return
+
+
+def cached_fetch(cache: EpisodeCache | None, session, url: str, parse, version: str | None = None, limiter=None):
+    """
+    キャッシュを確認しながら url を取得し、(エピソード, レスポンス) を返す。
+    version が一致するキャッシュはネットワークに出ずにそのまま返し（レスポンスは None）、
+    それ以外は ETag / Last-Modified で再検証する。取得に失敗した場合のエピソードは None。
+    """
+    entry = cache.get(url) if cache is not None else None
+    if entry is not None and version is not None and entry.get('version') == version:
+        logger.debug(f"キャッシュを使用: {url}")
+        metrics.count('cache_hits', kind='version')
+        return entry['episode'], None
+
+    headers = EpisodeCache.validators(entry)
+    if limiter is not None:
+        response = limiter.get(session, url, headers=headers)
+    else:
+        response = session.get(url, headers=headers)
+
+    if response.status_code == 304 and entry is not None:
+        logger.debug(f"キャッシュを再検証しました (304): {url}")
+        metrics.count('cache_hits', kind='revalidated')
+        cache.put(
+            url, entry['episode'],
+            response.headers.get('ETag', entry.get('etag')),
+            response.headers.get('Last-Modified', entry.get('last_modified')),
+            version,
+        )
+        return entry['episode'], response
+
+    if not response.ok:
+        return None, response
+
+    metrics.count('cache_misses')
+    episode = parse(response)
+    if cache is not None:
+        cache.put(url, episode, response.headers.get('ETag'), response.headers.get('Last-Modified'), version)
+    return episode, response
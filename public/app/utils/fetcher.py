@@ -0,0 +1,242 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import requests
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+# 再試行する HTTP ステータス (混雑・一時的な障害)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# 送信系のリクエストは、サーバが処理していないことが明らかな場合だけ再試行する (二重投稿を防ぐ)
+UNSAFE_RETRY_STATUSES = {429, 503}
+
+
+class FetchError(Exception):
+    """再試行しても取得できなかった場合の例外"""
+    pass
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    # Retry-After は秒数か HTTP 日付のどちらか
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    1ホスト分のトークンバケット。
+    失敗するとレートを半分に下げて一定時間ホスト全体を止め、成功が続くと設定値まで少しずつ戻す。
+    """
+
+    # この回数だけ続けて成功したらレートを上げる
+    recover_after = 5
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = max(rate / 16, 0.05) if rate > 0 else 0
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.successes = 0
+        self._lock = threading.Lock()
+
+        return
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self.blocked_until - now)
+            if self.rate > 0:
+                # 足りない分は前借りし、借りた分だけ待つ (後続のスレッドはさらに後ろに並ぶ)
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                self.tokens -= 1
+                if self.tokens < 0:
+                    wait = max(wait, -self.tokens / self.rate)
+
+        if wait > 0:
+            time.sleep(wait)
+        return
+
+    def limit(self, rate: float):
+        """上限を rate 以下に下げる (rate が 0 以下なら無制限の指定なので何もしない)"""
+        if rate <= 0:
+            return
+        with self._lock:
+            if self.max_rate <= 0 or rate < self.max_rate:
+                self.max_rate = rate
+                self.rate = min(self.rate, rate) if self.rate > 0 else rate
+                self.min_rate = max(rate / 16, 0.05)
+        return
+
+    def penalize(self, delay: float):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self.successes = 0
+        return
+
+    def reward(self):
+        with self._lock:
+            self.successes += 1
+            if self.successes >= self.recover_after and self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate * 1.25)
+                self.successes = 0
+        return
+
+
+class HostRateLimiter:
+    """
+    ホストごとのトークンバケットでリクエストを制御するリミッタ。
+    バケットはホスト名でプロセス全体に共有されるので、別々のインスタンスから同じホストへ送っても上限は共通になる。
+    同じホストに異なる上限のリミッタがある場合は、最も低い上限を使う。
+    429 / 503 などは Retry-After (無ければ指数的に伸ばした待ち時間) に従って再試行する。
+    """
+
+    _buckets = {}
+    _registry_lock = threading.Lock()
+
+    max_retries = 4
+    backoff_base = 1.0
+    backoff_max = 60.0
+
+    def __init__(self, requests_per_second: float = 1.0, burst: float = 1.0):
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+
+        return
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        with self._registry_lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.requests_per_second, self.burst)
+            else:
+                bucket.limit(self.requests_per_second)
+        return bucket
+
+    def wait(self, url: str):
+        self.bucket(url).acquire()
+        return
+
+    def backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.8, 1.2)
+
+    def request(self, session, method: str, url: str, **kwargs):
+        """
+        リミッタを通して session でリクエストを送る。
+        一時的な失敗は再試行し、それでも駄目なら FetchError を送出する。それ以外のレスポンスはそのまま返す。
+        """
+        bucket = self.bucket(url)
+        host = urlparse(url).netloc
+        safe = method.upper() in ('GET', 'HEAD')
+        retry_statuses = RETRY_STATUSES if safe else UNSAFE_RETRY_STATUSES
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                metrics.count('http_retries', host=host, reason=reason)
+            with metrics.timer('ratelimit_wait_seconds', host=host):
+                bucket.acquire()
+            started = time.perf_counter()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.count('http_errors', host=host, reason=e.__class__.__name__)
+                bucket.penalize(self.backoff(attempt))
+                if not safe:
+                    raise FetchError(f"{url} への送信結果を確認できませんでした ({e.__class__.__name__})") from e
+                reason = e.__class__.__name__
+            else:
+                metrics.observe('http_request_seconds', time.perf_counter() - started, host=host, method=method.upper())
+                metrics.observe('http_response_bytes', len(response.content), host=host)
+                metrics.count('http_responses', host=host, status=response.status_code)
+                if response.status_code not in retry_statuses:
+                    bucket.reward()
+                    return response
+                reason = f"HTTP {response.status_code}"
+                delay = parse_retry_after(response.headers.get('Retry-After'))
+                if delay is None:
+                    delay = self.backoff(attempt)
+                delay = min(delay, self.backoff_max)
+                bucket.penalize(delay)
+
+            if attempt < self.max_retries:
+                logger.warning(f"⏳ {reason} のため待機して再試行します ({attempt + 1}/{self.max_retries}): {url}")
+
+        raise FetchError(f"{url} を取得できませんでした ({reason})")
+
+    def get(self, session, url: str, **kwargs):
+        return self.request(session, 'GET', url, **kwargs)
+
+    def post(self, session, url: str, **kwargs):
+        return self.request(session, 'POST', url, **kwargs)
+
+
+def fetch_in_order(items, fetch, max_workers: int = 4, window: int | None = None):
+    """
+    items を並列に fetch し、元の順序どおりに結果を yield する。
+    fetch が None を返した時点で以降の取得を中止して終了する。
+    同時に抱える未処理の結果は window 件までに抑える。
+    """
+    max_workers = max(1, int(max_workers))
+    window = max(max_workers, window or max_workers * 2)
+    items = iter(items)
+    pending = deque()
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for item in items:
+            pending.append(executor.submit(fetch, item))
+            if len(pending) >= window:
+                break
+
+        while pending:
+            result = pending.popleft().result()
+            if result is None:
+                return
+
+            yield result
+
+            item = next(items, _END)
+            if item is not _END:
+                pending.append(executor.submit(fetch, item))
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def fetch_all_in_order(items, fetch, max_workers: int = 4, window: int | None = None):
+    """
+    fetch_in_order と同じく順番どおりに結果を yield し、途中で打ち切られた場合は最後に FetchError を送出する。
+    途中までのデータを完了したものとして扱わないようにするためのもの。
+    """
+    items = list(items)
+    count = 0
+    for result in fetch_in_order(items, fetch, max_workers=max_workers, window=window):
+        count += 1
+        yield result
+
+    if count < len(items):
+        raise FetchError(f"全 {len(items)} 話のうち {count} 話までしか取得できませんでした")
+    return
@@ -0,0 +1,55 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class Journal:
+    """
+    追記専用のジャーナル (JSON Lines)。
+    1レコード書くごとに fsync するので、途中で落ちても書き終えたレコードは失われない。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+        return
+
+    def append(self, record: dict):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return
+
+    def replay(self) -> list:
+        if not os.path.exists(self.path):
+            return []
+
+        records = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # 書き込み途中で落ちた末尾の行は捨てる
+                    logger.warning(f"⚠️ ジャーナルの壊れた行を無視します: {self.path}")
+                    break
+
+        return records
+
+    def truncate(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        return
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        return
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+from utils.journal import Journal
+
+logger = logging.getLogger(__name__)
+
+
+def episode_hash(episode: dict) -> str:
+    """タイトルと本文から内容ハッシュを求める"""
+    digest = hashlib.sha256()
+    digest.update(episode.get('title', '').encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(episode.get('content', '').encode('utf-8'))
+    return digest.hexdigest()
+
+
+class SyncManifest:
+    """
+    (掲載元の作品, 掲載先の作品) ごとに、投稿済みエピソードの内容ハッシュを記録するマニフェスト。
+    エピソードは投稿したときの掲載元での順番 (1始まり) で管理し、同じ内容かどうかはハッシュで照合する。
+    投稿の記録はまず追記専用のジャーナルに書き、次回読み込み時にスナップショットへまとめる。
+    """
+
+    def __init__(self, source: str, destination: str, directory: str = '../manifests'):
+        self.source = source
+        self.destination = destination.rstrip('/')
+        key = hashlib.sha1(f"{self.source}\n{self.destination}".encode('utf-8')).hexdigest()[:16]
+        self.path = os.path.join(directory, f"{key}.json")
+        self.episodes = {}
+        self.journal = Journal(os.path.join(directory, f"{key}.journal"))
+
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.episodes = {int(number): entry for number, entry in data.get('episodes', {}).items()}
+
+        # 前回の実行で中断された分をジャーナルから復元する
+        records = self.journal.replay()
+        if records:
+            for record in records:
+                self.episodes[int(record.pop('number'))] = record
+            logger.info(f"📒 ジャーナルから {len(records)} 件の投稿記録を復元しました")
+            self.save()
+            self.journal.truncate()
+
+        return
+
+    def iter_pending(self, episodes):
+        """
+        エピソードを順に受け取り、未投稿のものだけを (番号, エピソード) で返す。
+        投稿済みかどうかは番号ではなくハッシュで調べるので、掲載元で話が挿入・削除されて順番がずれても再投稿しない。
+        投稿済みの最後の話より前に現れた未知の内容は、変更 (または途中への挿入) とみなし、警告だけ出して飛ばす。
+        """
+        posted = {entry['hash']: number for number, entry in self.episodes.items()}
+        last_posted = max(self.episodes, default=0)
+        next_number = last_posted + 1
+        matched = edited = 0
+        # 最後に照合できた投稿済みの話の番号
+        position = 0
+
+        count = 0
+        for count, episode in enumerate(episodes, 1):
+            number = posted.get(episode_hash(episode))
+            if number is not None:
+                matched += 1
+                position = number
+                if number != count:
+                    logger.debug(f"投稿済みの第{number}話は掲載元では第{count}話です")
+                continue
+
+            title = episode.get('title', '(タイトルなし)')
+            if position < last_posted:
+                entry = self.episodes.get(count)
+                if entry is not None and entry['title'] == episode.get('title', ''):
+                    logger.warning(f"✏️ 投稿後に内容が変更されています: 第{count}話 {title}")
+                    edited += 1
+                else:
+                    logger.warning(f"✏️ 投稿済みの話の間に新しい話があります (途中には投稿できないため飛ばします): 第{count}話 {title}")
+                continue
+
+            # 投稿済みの話より後ろにある話だけを、番号が重ならないように投稿する
+            number = max(count, next_number)
+            next_number = number + 1
+            yield number, episode
+
+        missing = len(self.episodes) - matched - edited
+        if missing > 0:
+            logger.warning(f"⚠️ 投稿済みの {len(self.episodes)} 話のうち {missing} 話が掲載元に見つかりません"
+                           f" (掲載元 {count} 話。削除された可能性があります)")
+        return
+
+    def record(self, number: int, episode: dict):
+        entry = {
+            'title': episode.get('title', ''),
+            'hash': episode_hash(episode),
+            'posted_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        self.journal.append({'number': number, **entry})
+        self.episodes[number] = entry
+        return
+
+    def save(self):
+        data = {
+            'source': self.source,
+            'destination': self.destination,
+            'episodes': {str(number): entry for number, entry in sorted(self.episodes.items())},
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        return
+
+    def close(self):
+        # ジャーナルの内容をスナップショットへまとめる
+        self.save()
+        self.journal.truncate()
+        return
@@ -0,0 +1,99 @@
+import re
+from bs4 import NavigableString, Tag
+from bs4.element import Comment, Declaration, Doctype, ProcessingInstruction
+
+# 本文の中間表現は、ルビを |親文字《ルビ》、傍点を 《《文字》》 (カクヨム記法) で表す。
+# 投稿先の記法への変換は to_destination で行う。
+
+# なろうは傍点を1文字ずつのルビ「・」で表す
+EMPHASIS_RUBY = {'・', '﹅', '丶'}
+# 地の文の 《 はルビと解釈されないよう | を前に付けて書く (両サイト共通の書き方)
+ESCAPE_OPEN = re.compile('《')
+EMPHASIS = re.compile('《《(.+?)》》', re.S)
+
+_SKIP = (Comment, Declaration, Doctype, ProcessingInstruction)
+
+
+def _is_emphasis_tag(node: Tag) -> bool:
+    # カクヨムの傍点: <em class="emphasisDots"><span>傍</span><span>点</span></em>
+    return node.name == 'em' and 'emphasisDots' in (node.get('class') or [])
+
+
+def _plain_text(node) -> str:
+    return node.get_text() if isinstance(node, Tag) else str(node)
+
+
+def _ruby_parts(ruby: Tag):
+    """<ruby> を (親文字, ルビ) の組に分ける。ルビの無い親文字は (親文字, None)"""
+    base = []
+    for child in ruby.children:
+        if isinstance(child, _SKIP):
+            continue
+        if isinstance(child, Tag) and child.name == 'rp':
+            continue
+        if isinstance(child, Tag) and child.name == 'rt':
+            yield ''.join(base), child.get_text()
+            base = []
+            continue
+        base.append(_plain_text(child))
+    if base:
+        yield ''.join(base), None
+
+
+def iter_markup(root: Tag):
+    """
+    要素以下を1回だけたどり、ルビと傍点を中間表現の記法にした本文を少しずつ返す。
+    テキストの連結のされ方は Tag.text と同じ (ルビと傍点以外は同じ結果になる)。
+    """
+    emphasis = []
+
+    def flush():
+        if emphasis:
+            text = '《《' + ''.join(emphasis) + '》》'
+            emphasis.clear()
+            return text
+        return ''
+
+    # 再帰を使わず、明示的なスタックでたどる (とても長い本文でも深さの制限を受けない)
+    stack = [iter(root.children)]
+    while stack:
+        node = next(stack[-1], None)
+        if node is None:
+            stack.pop()
+            continue
+
+        if isinstance(node, _SKIP):
+            continue
+
+        if isinstance(node, NavigableString):
+            yield flush() + ESCAPE_OPEN.sub('|《', str(node))
+            continue
+
+        if node.name == 'ruby':
+            for base, ruby in _ruby_parts(node):
+                if ruby is None:
+                    yield flush() + ESCAPE_OPEN.sub('|《', base)
+                elif ruby.strip() in EMPHASIS_RUBY and len(base) == 1:
+                    emphasis.append(base)
+                else:
+                    yield flush() + f'|{base}《{ruby}》'
+            continue
+
+        if _is_emphasis_tag(node):
+            emphasis.append(node.get_text())
+            continue
+
+        stack.append(iter(node.children))
+
+    yield flush()
+
+
+def to_markup(root: Tag) -> str:
+    return ''.join(iter_markup(root))
+
+
+def to_destination(text: str, platform: str) -> str:
+    """中間表現の本文を投稿先の記法にする (ルビは共通、傍点はなろうだけ1文字ずつのルビにする)"""
+    if platform == 'narou':
+        return EMPHASIS.sub(lambda m: ''.join(f'|{char}《・》' if char.strip() else char for char in m.group(1)), text)
+    return text
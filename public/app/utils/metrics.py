@@ -0,0 +1,131 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+class Metrics:
+    """
+    実行中の計測値を集計する。
+    observe は所要時間やバイト数などの分布 (件数・合計・最小・最大)、count は回数を記録する。
+    値は名前とラベル (host や step など) の組ごとに集計する。
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._observations = {}
+        self._counters = {}
+
+        return
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            stats = self._observations.get(key)
+            if stats is None:
+                self._observations[key] = {'count': 1, 'sum': value, 'min': value, 'max': value}
+            else:
+                stats['count'] += 1
+                stats['sum'] += value
+                stats['min'] = min(stats['min'], value)
+                stats['max'] = max(stats['max'], value)
+        return
+
+    def count(self, name: str, amount: int = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+        return
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            observations = [
+                {'name': name, 'labels': dict(labels), **stats, 'average': stats['sum'] / stats['count']}
+                for (name, labels), stats in sorted(self._observations.items())
+            ]
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+        return {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'elapsed': round(time.time() - self.started, 3),
+            'observations': observations,
+            'counters': counters,
+        }
+
+    def write_report(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        logger.info(f"📊 計測結果を保存しました: {path}")
+        return
+
+    def prometheus_text(self) -> str:
+        # Prometheus のテキスト形式 (分布は _count / _sum / _max として出す)
+        def labels_text(labels: dict) -> str:
+            if not labels:
+                return ''
+            return '{' + ','.join(f'{key}="{str(value).replace(chr(34), "")}"' for key, value in labels.items()) + '}'
+
+        snapshot = self.snapshot()
+        lines = []
+        for item in snapshot['observations']:
+            labels = labels_text(item['labels'])
+            lines.append(f"syosetu_{item['name']}_count{labels} {item['count']}")
+            lines.append(f"syosetu_{item['name']}_sum{labels} {item['sum']}")
+            lines.append(f"syosetu_{item['name']}_max{labels} {item['max']}")
+        for item in snapshot['counters']:
+            lines.append(f"syosetu_{item['name']}_total{labels_text(item['labels'])} {item['value']}")
+        return '\n'.join(lines) + '\n'
+
+
+# プロセス全体で共有する計測値
+metrics = Metrics()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        return
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            body, content_type = metrics.prometheus_text(), 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path == '/metrics.json':
+            body, content_type = json.dumps(metrics.snapshot(), ensure_ascii=False), 'application/json'
+        else:
+            self.send_error(404)
+            return
+
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        return
+
+
+def start_metrics_server(port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """/metrics (Prometheus 形式) と /metrics.json で計測値を返すサーバをバックグラウンドで起動する"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"📊 計測値を http://{host}:{server.server_address[1]}/metrics で公開しています")
+    return server
@@ -0,0 +1,85 @@
+import logging
+import re
+from concurrent.futures import ProcessPoolExecutor
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
+from utils.markup import to_markup
+from utils import profiling
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lxml  # noqa: F401
+    DEFAULT_BACKEND = 'lxml'
+except ImportError:
+    DEFAULT_BACKEND = 'html.parser'
+
+
+def make_strainer(selectors) -> SoupStrainer | None:
+    """
+    単純なセレクタ (すべて ".class" か、すべて "#id") なら、その要素以下だけを解析する SoupStrainer を作る。
+    それ以外のセレクタが混ざる場合は None (全体を解析する)。
+    """
+    selectors = list(selectors)
+    if selectors and all(re.fullmatch(r'\.[\w-]+', sel) for sel in selectors):
+        # 解析中の class 属性は "a b" のような空白区切りの文字列なので、単語単位で照合する
+        names = '|'.join(re.escape(sel[1:]) for sel in selectors)
+        return SoupStrainer(class_=re.compile(rf'(^|\s)({names})(\s|$)'))
+    if selectors and all(re.fullmatch(r'#[\w-]+', sel) for sel in selectors):
+        return SoupStrainer(id=[sel[1:] for sel in selectors])
+    return None
+
+
+def parse(markup: str, selectors=None, backend: str | None = None) -> BeautifulSoup:
+    """HTML を解析する。selectors を渡すと、可能ならその要素以下だけを解析する"""
+    strainer = make_strainer(selectors) if selectors else None
+    return BeautifulSoup(markup, backend or DEFAULT_BACKEND, parse_only=strainer)
+
+
+def extract_text(markup: str, selectors: dict, backend: str | None = None, markup_keys=()) -> dict:
+    """
+    {キー: セレクタ} の各要素のテキストを {キー: テキスト} で返す。要素が無ければ ValueError。
+    markup_keys のキーはルビと傍点を記法 (utils.markup) で残したテキストにする。
+    """
+    html = parse(markup, selectors.values(), backend)
+    data = {}
+    for key, selector in selectors.items():
+        node = html.select_one(selector)
+        if node is None:
+            raise ValueError(f"ページに要素が見つかりません: {selector}")
+        data[key] = to_markup(node) if key in markup_keys else node.text
+    return data
+
+
+class HtmlParser:
+    """
+    解析エンジン (lxml があれば lxml、無ければ html.parser) を選び、必要な部分だけを解析するパーサ。
+    processes を指定すると、解析をプロセスプールに任せて GIL の競合を避ける。
+    """
+
+    def __init__(self, backend: str | None = None, processes: int = 0):
+        if backend and builder_registry.lookup(backend) is None:
+            # 設定された解析エンジンがインストールされていなければ、使えるもので続ける
+            logger.warning(f"⚠️ HTML解析エンジン {backend} が使えないため {DEFAULT_BACKEND} を使います")
+            backend = None
+        self.backend = backend or DEFAULT_BACKEND
+        self._pool = ProcessPoolExecutor(max_workers=processes) if processes > 0 else None
+        logger.debug(f"HTML解析エンジン: {self.backend} (プロセス数: {processes})")
+
+        return
+
+    def soup(self, markup: str, selectors=None) -> BeautifulSoup:
+        return parse(markup, selectors, self.backend)
+
+    def extract_text(self, markup: str, selectors: dict, markup_keys=()) -> dict:
+        with metrics.timer('parse_seconds', backend=self.backend), profiling.unit('parse'):
+            if self._pool is not None:
+                return self._pool.submit(extract_text, markup, selectors, self.backend, tuple(markup_keys)).result()
+            return extract_text(markup, selectors, self.backend, markup_keys)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        return
@@ -0,0 +1,70 @@
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class EpisodeStream:
+    """
+    エピソードのイテレータを別スレッドで先読みし、上限付きのキューで受け渡す。
+    ダウンロード (生産側) と投稿 (消費側) を重ねて実行しつつ、
+    キューが一杯になれば生産側を待たせてメモリ使用量を抑える。
+    """
+
+    def __init__(self, episodes, queue_size: int = 16):
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._produce, args=(episodes,), daemon=True)
+        self._thread.start()
+
+        return
+
+    def _put(self, item):
+        # 消費側が止まった場合に抜けられるよう、タイムアウト付きで待つ
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, episodes):
+        try:
+            for episode in episodes:
+                if not self._put(episode):
+                    return
+        except Exception as e:
+            self._error = e
+        finally:
+            close = getattr(episodes, 'close', None)
+            if close is not None:
+                close()
+            self._put(_END)
+
+    def __iter__(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _END:
+                    break
+                yield item
+
+            if self._error is not None:
+                raise self._error
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        生産側を止め、スレッドが終わるまで待つ (取得中のエピソードがあれば、その完了を待つ)。
+        一度も反復しなかったストリームも、これを呼ばないとスレッドが残り続ける。
+        """
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        return
@@ -0,0 +1,234 @@
+import cProfile
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+_active = None
+
+
+class Profiler:
+    """
+    処理の段階 (metadata / download / parse / upload) ごとの CPU プロファイルと、1件ごとの所要時間・メモリ使用量を記録する。
+    CPU プロファイルはスレッドごとに取り、段階ごとにまとめる。入れ子になった段階 (ダウンロード中の解析など) は
+    内側の段階の間だけ外側の計測を止めるので、時間はどちらか一方にだけ数えられる。
+    メモリは tracemalloc で追跡し、使用量が大きく増えたときのスナップショットから確保の多い箇所を出す。
+    """
+
+    def __init__(self, directory: str, top: int = 20, frames: int = 1):
+        self.directory = directory
+        self.top = top
+        self.started = time.perf_counter()
+        self.units = []
+        self._profiles = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._peak_snapshot = None
+        self._peak_size = 0
+
+        os.makedirs(directory, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._baseline = tracemalloc.take_snapshot()
+
+        return
+
+    def _profile(self, phase: str) -> cProfile.Profile:
+        key = (phase, threading.get_ident())
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is None:
+                profile = self._profiles[key] = cProfile.Profile()
+        return profile
+
+    @staticmethod
+    def _switch(stop: cProfile.Profile | None, start: cProfile.Profile | None):
+        if stop is not None:
+            stop.disable()
+        if start is not None:
+            try:
+                start.enable()
+            except ValueError:
+                # 別のプロファイラが動いているスレッドでは CPU プロファイルを取らない
+                logger.debug("CPU プロファイルを開始できませんでした", exc_info=True)
+        return
+
+    @contextmanager
+    def unit(self, phase: str, label=None):
+        stack = self._local.__dict__.setdefault('stack', [])
+        outer = stack[-1] if stack else None
+        profile = self._profile(phase)
+        stack.append(profile)
+
+        memory_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        self._switch(outer, profile)
+        try:
+            yield
+        finally:
+            # 記録やスナップショットにかかる時間はどの段階にも含めない
+            self._switch(profile, None)
+            memory = tracemalloc.get_traced_memory()[0]
+            with self._lock:
+                self.units.append({
+                    'phase': phase,
+                    'label': None if label is None else str(label),
+                    'nested': outer is not None,
+                    'seconds': time.perf_counter() - started,
+                    'cpu_seconds': time.thread_time() - cpu_started,
+                    # 他のスレッドの確保も含むので、並列に動いている場合は目安
+                    'memory_delta': memory - memory_before,
+                })
+            self._check_peak(memory)
+            stack.pop()
+            self._switch(None, outer)
+
+    def _check_peak(self, memory: int):
+        # 使用量が前回のスナップショットより 10% 以上増えたときだけ取り直す (回数は対数的にしか増えない)
+        with self._lock:
+            if memory <= self._peak_size * 1.1:
+                return
+            self._peak_size = memory
+        snapshot = tracemalloc.take_snapshot()
+        with self._lock:
+            if memory >= self._peak_size:
+                self._peak_snapshot = snapshot
+        return
+
+    def phase_stats(self) -> dict:
+        """段階ごとにスレッドのプロファイルをまとめた pstats.Stats を返す"""
+        stats = {}
+        with self._lock:
+            profiles = list(self._profiles.items())
+        for (phase, _), profile in profiles:
+            profile.create_stats()
+            if not profile.stats:
+                continue
+            if phase in stats:
+                stats[phase].add(profile)
+            else:
+                stats[phase] = pstats.Stats(profile)
+        return stats
+
+    def hot_spots(self, stats: pstats.Stats) -> list:
+        rows = []
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({
+                'function': f"{filename}:{line}({name})",
+                'calls': calls,
+                'tottime': round(tottime, 4),
+                'cumtime': round(cumtime, 4),
+            })
+        rows.sort(key=lambda row: row['tottime'], reverse=True)
+        return rows[:self.top]
+
+    def allocations(self, snapshot: tracemalloc.Snapshot) -> list:
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        return [
+            {
+                'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                'size_kb': round(stat.size_diff / 1024, 1),
+                'count': stat.count_diff,
+            }
+            for stat in snapshot.compare_to(self._baseline, 'lineno')[:self.top]
+        ]
+
+    def summary(self) -> dict:
+        phases = defaultdict(lambda: {'count': 0, 'seconds': 0.0, 'cpu_seconds': 0.0})
+        with self._lock:
+            units = list(self.units)
+        for unit in units:
+            phase = phases[unit['phase']]
+            phase['count'] += 1
+            phase['seconds'] += unit['seconds']
+            phase['cpu_seconds'] += unit['cpu_seconds']
+
+        stats = self.phase_stats()
+        _, peak = tracemalloc.get_traced_memory()
+        return {
+            'elapsed': round(time.perf_counter() - self.started, 3),
+            'peak_memory_kb': round(peak / 1024, 1),
+            'phases': {
+                name: {
+                    'count': phase['count'],
+                    'seconds': round(phase['seconds'], 3),
+                    'cpu_seconds': round(phase['cpu_seconds'], 3),
+                    'hot_spots': self.hot_spots(stats[name]) if name in stats else [],
+                }
+                for name, phase in phases.items()
+            },
+            'units': [
+                {**unit, 'seconds': round(unit['seconds'], 4), 'cpu_seconds': round(unit['cpu_seconds'], 4)}
+                for unit in units
+            ],
+            # 終了時点で残っているメモリと、使用量が最も大きかったときのメモリの内訳
+            'retained_allocations': self.allocations(tracemalloc.take_snapshot()),
+            'peak_allocations': self.allocations(self._peak_snapshot) if self._peak_snapshot is not None else [],
+        }
+
+    def write_report(self):
+        """段階ごとの .prof (python -m pstats や snakeviz で開ける)、report.json と report.txt を書き出す"""
+        for phase, stats in self.phase_stats().items():
+            stats.dump_stats(os.path.join(self.directory, f"{phase}.prof"))
+
+        summary = self.summary()
+        with open(os.path.join(self.directory, 'report.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        with open(os.path.join(self.directory, 'report.txt'), 'w', encoding='utf-8') as f:
+            f.write(format_report(summary))
+
+        logger.info(f"🔬 プロファイルを保存しました: {self.directory}")
+        return
+
+
+def format_report(summary: dict) -> str:
+    lines = [f"経過時間 {summary['elapsed']:.2f}s / メモリのピーク {summary['peak_memory_kb'] / 1024:.1f} MB", ""]
+
+    for name, phase in summary['phases'].items():
+        average = phase['seconds'] / phase['count'] if phase['count'] else 0
+        lines.append(f"== {name}: {phase['count']} 件 / 合計 {phase['seconds']:.2f}s (CPU {phase['cpu_seconds']:.2f}s) / 平均 {average:.3f}s")
+        lines.append(f"  {'tottime':>9} {'cumtime':>9} {'calls':>8}  関数")
+        for row in phase['hot_spots']:
+            lines.append(f"  {row['tottime']:9.3f} {row['cumtime']:9.3f} {row['calls']:8d}  {row['function']}")
+        lines.append("")
+
+    slowest = sorted((unit for unit in summary['units'] if unit['label'] is not None), key=lambda unit: unit['seconds'], reverse=True)
+    if slowest:
+        lines.append("== 時間のかかった処理")
+        for unit in slowest[:10]:
+            lines.append(f"  {unit['seconds']:8.3f}s (CPU {unit['cpu_seconds']:.3f}s, メモリ {unit['memory_delta'] / 1024:+.0f} KB)  {unit['phase']} {unit['label']}")
+        lines.append("")
+
+    for title, key in (("メモリのピーク時に確保されていた箇所", 'peak_allocations'), ("終了時に残っていた確保", 'retained_allocations')):
+        if summary[key]:
+            lines.append(f"== {title}")
+            for row in summary[key]:
+                lines.append(f"  {row['size_kb']:10.1f} KB {row['count']:8d} 個  {row['location']}")
+            lines.append("")
+
+    return '\n'.join(lines)
+
+
+def start(directory: str, **options) -> Profiler:
+    """プロセス全体のプロファイルを開始する。以降の unit() が記録される"""
+    global _active
+    _active = Profiler(directory, **options)
+    return _active
+
+
+def unit(phase: str, label=None):
+    """プロファイル中なら phase の1件として計測するコンテキスト (していなければ何もしない)"""
+    if _active is None:
+        return nullcontext()
+    return _active.unit(phase, label)
@@ -0,0 +1,114 @@
+import hashlib
+import io
+import json
+import logging
+import os
+from urllib.parse import urlparse
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger(__name__)
+
+# 記録するときは条件付きリクエストにせず、常に本文を受け取る (再生時にキャッシュが空でも使えるように)
+CONDITIONAL_HEADERS = ('If-None-Match', 'If-Modified-Since')
+# 本文は展開済みで保存するので、再生時には付けない
+DROPPED_HEADERS = ('Content-Encoding', 'Content-Length', 'Transfer-Encoding')
+
+_mode = None
+_directory = None
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    requests のセッションに取り付け、レスポンスをディレクトリに記録 (record) したり、記録から返したり (replay) する。
+    リクエストはメソッド・URL・本文の組で区別する。再生時に記録の無いリクエストは 404 を返す。
+    """
+
+    def __init__(self, directory: str, mode: str = 'replay'):
+        super().__init__()
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"不明なモードです: {mode}")
+        self.directory = directory
+        self.mode = mode
+
+        return
+
+    def path_for(self, request) -> str:
+        body = request.body or b''
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        digest = hashlib.sha256(f"{request.method} {request.url}\n".encode('utf-8') + body).hexdigest()[:32]
+        return os.path.join(self.directory, urlparse(request.url).netloc or '_', digest)
+
+    def send(self, request, **kwargs):
+        path = self.path_for(request)
+        if self.mode == 'replay':
+            return self.replay(request, path)
+
+        for name in CONDITIONAL_HEADERS:
+            request.headers.pop(name, None)
+        response = super().send(request, **kwargs)
+        self.record(path, request, response)
+        return response
+
+    def record(self, path: str, request, response):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.body', 'wb') as f:
+            f.write(response.content)
+        with open(path + '.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                'method': request.method,
+                'url': request.url,
+                'status': response.status_code,
+                'reason': response.reason,
+                'headers': {key: value for key, value in response.headers.items() if key not in DROPPED_HEADERS},
+            }, f, ensure_ascii=False, indent=2)
+        return
+
+    def replay(self, request, path: str) -> Response:
+        response = Response()
+        response.request = request
+        response.url = request.url
+        response.connection = self
+
+        if not os.path.exists(path + '.json'):
+            logger.warning(f"⚠️ 記録されていないリクエストです: {request.method} {request.url}")
+            response.status_code = 404
+            response.reason = 'Not Recorded'
+            response._content = b''
+            response.raw = io.BytesIO(b'')
+            return response
+
+        with open(path + '.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(path + '.body', 'rb') as f:
+            body = f.read()
+
+        response.status_code = meta['status']
+        response.reason = meta['reason']
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = body
+        response.raw = io.BytesIO(body)
+        return response
+
+
+def configure(mode: str | None, directory: str | None = None):
+    """以降に mount() されるセッションの記録・再生を設定する (mode が None なら通常どおり通信する)"""
+    global _mode, _directory
+    _mode, _directory = mode, directory
+    if mode is not None:
+        logger.info(f"📼 HTTP のレスポンスを{'記録' if mode == 'record' else '記録から再生'}します: {directory}")
+    return
+
+
+def mount(session):
+    """記録・再生が設定されていれば session に取り付ける"""
+    if _mode is None:
+        return session
+    adapter = RecordingAdapter(_directory, _mode)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
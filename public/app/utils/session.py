@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """
+    ログイン状態をサイトごとに保存し、次回の起動で再利用する。
+    mode は "cookies" (クッキーを JSON に保存) か "profile" (Chrome のプロファイルをそのまま使い回す)。
+    クッキーは Chrome DevTools Protocol の形式 (name, value, domain, path, expires, ...) で保存する。
+    """
+
+    modes = ("cookies", "profile")
+
+    def __init__(self, mode: str = "cookies", directory: str = '../sessions'):
+        if mode not in self.modes:
+            raise ValueError(f"未対応のセッション保存方式です: {mode}")
+
+        self.mode = mode
+        self.directory = directory
+        self._profiles_in_use = set()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        return
+
+    def cookie_path(self, site: str) -> str:
+        return os.path.join(self.directory, f"{site}.cookies.json")
+
+    def load_cookies(self, site: str) -> list | None:
+        path = self.cookie_path(site)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                cookies = json.load(f)
+        except ValueError:
+            logger.warning(f"⚠️ 保存済みのクッキーを読み込めませんでした: {path}")
+            return None
+
+        # 期限切れのものは捨てる (expires が無い・負のものはセッションクッキー)
+        now = time.time()
+        return [cookie for cookie in cookies if not (0 < cookie.get('expires', -1) < now)]
+
+    def save_cookies(self, site: str, cookies: list):
+        path = self.cookie_path(site)
+        tmp_path = path + '.tmp'
+        # ログイン情報と同じ扱いなので、所有者だけが読めるようにする
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(cookies, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return
+
+    def clear(self, site: str):
+        path = self.cookie_path(site)
+        if os.path.exists(path):
+            os.remove(path)
+        return
+
+    def acquire_profile(self, site: str) -> str:
+        """
+        使われていないプロファイルのディレクトリを返す。
+        Chrome は同じプロファイルを同時に開けないため、同時に起動するドライバごとに別のディレクトリを使う。
+        """
+        with self._lock:
+            slot = 0
+            while (site, slot) in self._profiles_in_use:
+                slot += 1
+            self._profiles_in_use.add((site, slot))
+
+        return os.path.abspath(os.path.join(self.directory, f"{site}-profile-{slot}"))
+
+    def release_profile(self, site: str, path: str):
+        slot = int(path.rsplit('-', 1)[1])
+        with self._lock:
+            self._profiles_in_use.discard((site, slot))
+        return
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_session_store(conf: dict | None) -> SessionStore | None:
+    """config.json の session 設定からストアを返す (同じ設定なら同じストアを共有する)。無効なら None"""
+    conf = conf or {}
+    mode = conf.get("mode", "none")
+    if mode in (None, "none"):
+        return None
+
+    directory = conf.get("directory", '../sessions')
+    with _stores_lock:
+        key = (mode, os.path.abspath(directory))
+        if key not in _stores:
+            _stores[key] = SessionStore(mode, directory)
+        return _stores[key]
@@ -0,0 +1,55 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from utils.metrics import metrics
+
+
+class StepTimer:
+    """
+    処理の段階 (ページ読み込み、入力、送信など) ごとの所要時間を集計する。
+    metric を指定すると、実行全体の計測値 (utils.metrics) にも step と labels を付けて記録する。
+    """
+
+    def __init__(self, metric: str | None = None, **labels):
+        self.metric = metric
+        self.labels = labels
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.last = {}
+
+        return
+
+    @contextmanager
+    def step(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.totals[name] += elapsed
+            self.counts[name] += 1
+            self.last[name] = elapsed
+            if self.metric is not None:
+                metrics.observe(self.metric, elapsed, step=name, **self.labels)
+
+    def start_round(self):
+        # 1件分 (1エピソード分) の計測を始める
+        self.last = {}
+        return
+
+    def format_last(self) -> str:
+        return " / ".join(f"{name} {elapsed:.2f}s" for name, elapsed in self.last.items())
+
+    def summary(self) -> dict:
+        return {
+            name: {
+                "count": self.counts[name],
+                "total": round(total, 3),
+                "average": round(total / self.counts[name], 3),
+            }
+            for name, total in self.totals.items()
+        }
+
+    def format_summary(self) -> str:
+        return " / ".join(f"{name} 平均 {data['average']:.2f}s" for name, data in self.summary().items())